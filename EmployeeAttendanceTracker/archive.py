@@ -0,0 +1,236 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Closed attendance rows older than a cutoff are moved out of the table into
+# one file per month of check_in. A file holds each column as its own
+# zlib-compressed block of fixed-width integers, behind a JSON header giving
+# every block's offset and length. Readers mmap the file and decompress only
+# the columns a query needs, so an employee/date-range lookup inflates
+# employee_id and check_in first and the other columns only when rows match.
+#
+#   magic (8 bytes) | header length (4 bytes, little-endian) | JSON header | column blocks
+
+ARCHIVE_DIR = os.getenv("ATTENDANCE_ARCHIVE_DIR",
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+MAGIC = b"ATTCOL1\n"
+COLUMNS = ("attendance_id", "employee_id", "check_in", "check_out", "total_hours")
+# Stands in for NULL in the int64 columns
+NULL = -2 ** 63
+EPOCH = datetime(1970, 1, 1)
+# Rows per DELETE statement when clearing archived rows from the table
+DELETE_BATCH_SIZE = 1000
+
+
+def as_datetime(moment):
+    return moment if isinstance(moment, datetime) else datetime.combine(moment, datetime.min.time())
+
+def to_seconds(moment):
+    if moment is None:
+        return NULL
+    return int((as_datetime(moment) - EPOCH).total_seconds())
+
+def from_seconds(seconds):
+    return None if seconds == NULL else EPOCH + timedelta(seconds=seconds)
+
+def to_hundredths(hours):
+    return NULL if hours is None else int(round(float(hours) * 100))
+
+def from_hundredths(value):
+    # total_hours is DECIMAL in the table; keep it a Decimal here too
+    return None if value == NULL else Decimal(value).scaleb(-2)
+
+def month_of(moment):
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+def month_bounds(month):
+    year, number = map(int, month.split("-"))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+class MonthFile:
+    # Read side of one archived month; columns are inflated on first use
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an attendance archive")
+        header_length = struct.unpack_from("<I", self.map, len(MAGIC))[0]
+        data_start = len(MAGIC) + 4
+        self.header = json.loads(self.map[data_start:data_start + header_length])
+        self.data_start = data_start + header_length
+        self.rows = self.header["rows"]
+        self.cache = {}
+
+    def column(self, name):
+        values = self.cache.get(name)
+        if values is None:
+            block = self.header["columns"][name]
+            start = self.data_start + block["offset"]
+            values = array("q")
+            values.frombytes(zlib.decompress(self.map[start:start + block["length"]]))
+            if sys.byteorder != "little":
+                values.byteswap()
+            self.cache[name] = values
+        return values
+
+    def contains(self, attendance_id):
+        ids = self.column("attendance_id")
+        i = bisect.bisect_left(ids, attendance_id)
+        return i < len(ids) and ids[i] == attendance_id
+
+    def select(self, employee_ids=None, start=None, end=None):
+        # Yields (attendance_id, employee_id, check_in, check_out, total_hours)
+        # in attendance_id order for rows matching the filters
+        if start is not None and to_seconds(start) > self.header["max_check_in"]:
+            return
+        if end is not None and to_seconds(end) <= self.header["min_check_in"]:
+            return
+        matches = range(self.rows)
+        if employee_ids is not None:
+            employee_column = self.column("employee_id")
+            matches = [i for i in matches if employee_column[i] in employee_ids]
+        if start is not None or end is not None:
+            check_in = self.column("check_in")
+            low = to_seconds(start) if start is not None else NULL
+            high = to_seconds(end) if end is not None else 2 ** 63 - 1
+            matches = [i for i in matches if low <= check_in[i] < high]
+        if not matches:
+            return
+        columns = [self.column(name) for name in COLUMNS]
+        for i in matches:
+            attendance_id, employee_id, check_in, check_out, total_hours = (column[i] for column in columns)
+            yield (attendance_id, employee_id, from_seconds(check_in), from_seconds(check_out),
+                   from_hundredths(total_hours))
+
+    def close(self):
+        self.cache.clear()
+        self.map.close()
+
+
+class Archive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+
+    def path(self, month):
+        return os.path.join(self.directory, f"attendance-{month}.col")
+
+    def months(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[len("attendance-"):-len(".col")] for name in os.listdir(self.directory)
+                      if name.startswith("attendance-") and name.endswith(".col"))
+
+    def open(self, month):
+        return MonthFile(self.path(month))
+
+    def write(self, month, rows):
+        # Merges rows into the month's file, keeping one copy of each
+        # attendance_id, and replaces the file atomically. Returns the row count.
+        merged = {}
+        if os.path.exists(self.path(month)):
+            existing = self.open(month)
+            try:
+                merged.update((row[0], row) for row in existing.select())
+            finally:
+                existing.close()
+        merged.update((row[0], tuple(row)) for row in rows)
+        ordered = [merged[attendance_id] for attendance_id in sorted(merged)]
+
+        encoders = (int, int, to_seconds, to_seconds, to_hundredths)
+        header = {"version": 1, "month": month, "rows": len(ordered), "columns": {}}
+        blocks = []
+        offset = 0
+        for index, (name, encode) in enumerate(zip(COLUMNS, encoders)):
+            values = array("q", (encode(row[index]) for row in ordered))
+            if sys.byteorder != "little":
+                values.byteswap()
+            block = zlib.compress(values.tobytes(), 6)
+            header["columns"][name] = {"type": "int64", "offset": offset, "length": len(block)}
+            blocks.append(block)
+            offset += len(block)
+        check_ins = [to_seconds(row[2]) for row in ordered]
+        header["min_check_in"] = min(check_ins, default=0)
+        header["max_check_in"] = max(check_ins, default=0)
+        encoded_header = json.dumps(header).encode()
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<I", len(encoded_header)))
+                f.write(encoded_header)
+                for block in blocks:
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path(month))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return len(ordered)
+
+    def select(self, employee_ids=None, start=None, end=None):
+        # Archived rows for the months overlapping [start, end), month by month
+        for month in self.months():
+            month_start, month_end = month_bounds(month)
+            if (start is not None and month_end <= as_datetime(start)) or \
+                    (end is not None and month_start >= as_datetime(end)):
+                continue
+            month_file = self.open(month)
+            try:
+                yield from month_file.select(employee_ids, start, end)
+            finally:
+                month_file.close()
+
+def archive_before(db, cutoff, archive=None):
+    # Moves closed sessions that checked in before `cutoff` from the
+    # attendance table into the archive, one month at a time. Each month's
+    # file is written and synced before its rows are deleted; if the job
+    # stops in between, the next run merges the same rows again without
+    # duplicating them. Returns {month: rows moved}.
+    archive = archive if archive is not None else db.archive
+    cutoff = as_datetime(cutoff)
+    with db.pool.cursor() as (conn, cursor):
+        # ORDER BY/LIMIT rather than MIN() so the value keeps its column
+        # type on backends that don't type aggregates (SQLite)
+        cursor.execute("SELECT check_in FROM attendance WHERE check_out IS NOT NULL AND check_in < %s "
+                       "ORDER BY check_in LIMIT 1", (cutoff,))
+        oldest = cursor.fetchone()
+    moved = {}
+    if oldest is None:
+        return moved
+    oldest = oldest[0]
+    month_start = datetime(oldest.year, oldest.month, 1)
+    while month_start < cutoff:
+        month = month_of(month_start)
+        month_end = min(month_bounds(month)[1], cutoff)
+        rows = [tuple(row) for row in db.iter_attendance(start=month_start, end=month_end) if row.check_out]
+        if rows:
+            archive.write(month, rows)
+            ids = [row[0] for row in rows]
+            with db.pool.cursor() as (conn, cursor):
+                for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                    batch = ids[start:start + DELETE_BATCH_SIZE]
+                    cursor.execute(
+                        "DELETE FROM attendance WHERE check_out IS NOT NULL "
+                        f"AND attendance_id IN ({', '.join(['%s'] * len(batch))})",
+                        tuple(batch))
+                conn.commit()
+            moved[month] = len(rows)
+        month_start = month_bounds(month)[1]
+    return moved
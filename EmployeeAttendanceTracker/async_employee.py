@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from employee import EmployeeDB, SwipeRecorder
+
+# Extra calls allowed to queue for a worker thread beyond the ones running;
+# past that, callers wait on the event loop without tying up anything else
+ASYNC_QUEUE_SIZE = 64
+
+
+class AsyncEmployeeDB:
+    # asyncio front end for EmployeeDB. Each call runs on a bounded thread
+    # pool sized to the connection pool, so threads never queue for a
+    # connection. At most `workers + queue_size` calls are handed to the pool
+    # at once; the rest await a slot on the event loop (backpressure).
+    #
+    # A slot is freed when the thread finishes, not when the awaiting task
+    # does: cancelling a call that has already started lets it run to the end
+    # and return its connection, and only a call still queued is dropped.
+    #
+    # With swipe_window set, check_in/check_out go through a SwipeRecorder,
+    # so thousands of concurrent swipes become a few batched writes and an
+    # awaiting swipe holds no thread at all. Swipes take a slot as well, and
+    # like a started call, a swipe handed to the recorder is written even if
+    # its caller is cancelled.
+
+    def __init__(self, db=None, workers=None, queue_size=ASYNC_QUEUE_SIZE, swipe_window=None):
+        self.db = db if db is not None else EmployeeDB()
+        self.workers = workers or self.db.pool.size
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="employeedb")
+        self.slots = asyncio.Semaphore(self.workers + queue_size)
+        self.recorder = SwipeRecorder(self.db, window=swipe_window) if swipe_window is not None else None
+
+    async def add_employee(self, employee_id, name, department):
+        return await self._run(self.db.add_employee, employee_id, name, department)
+
+    async def check_in(self, employee_id):
+        if self.recorder is not None:
+            return await self._swipe("in", employee_id)
+        return await self._run(self.db.check_in, employee_id)
+
+    async def check_out(self, employee_id):
+        if self.recorder is not None:
+            return await self._swipe("out", employee_id)
+        return await self._run(self.db.check_out, employee_id)
+
+    async def check_in_many(self, employee_ids):
+        return await self._run(self.db.check_in_many, list(employee_ids))
+
+    async def check_out_many(self, employee_ids):
+        return await self._run(self.db.check_out_many, list(employee_ids))
+
+    async def list_incomplete_attendance(self):
+        return await self._run(self.db.list_incomplete_attendance)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        if self.recorder is not None:
+            await loop.run_in_executor(None, self.recorder.close)
+        await loop.run_in_executor(None, self.executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, fn, *args):
+        await self.slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self._release(loop))
+        # If the caller is cancelled, wrap_future cancels `future` only if it
+        # hasn't started; a running call finishes and then frees its slot
+        return await asyncio.wrap_future(future, loop=loop)
+
+    async def _swipe(self, action, employee_id):
+        await self.slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.recorder.submit(action, employee_id)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self._release(loop))
+        # shield keeps a cancelled caller from cancelling the recorder's future
+        return await asyncio.shield(asyncio.wrap_future(future, loop=loop))
+
+    def _release(self, loop):
+        # Runs on the worker thread; asyncio.Semaphore belongs to the loop
+        try:
+            loop.call_soon_threadsafe(self.slots.release)
+        except RuntimeError:
+            # The loop has already been closed
+            pass
@@ -0,0 +1,80 @@
+# Shift-start burst: N employees check in and then out, first one call each
+# through check_in/check_out, then through check_in_many/check_out_many, then
+# as concurrent individual swipes through SwipeRecorder. Prints rows/second
+# for each path. Runs against the database in config.py (DB_SQLITE_PATH
+# selects SQLite); the employees it creates (ids from --first-id) and their
+# attendance rows are removed after.
+#
+#   python bench_checkin.py --employees 500 --threads 32
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+from employee import EmployeeDB, SwipeRecorder
+
+
+def setup(db, ids):
+    with db.pool.cursor() as (conn, cursor):
+        cursor.executemany("INSERT IGNORE INTO employees (employee_id, name, department) VALUES (%s, %s, %s)",
+                           [(employee_id, f"bench{employee_id}", "bench") for employee_id in ids])
+        conn.commit()
+
+def cleanup(db, ids):
+    with db.pool.cursor() as (conn, cursor):
+        marks = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"DELETE FROM attendance WHERE employee_id IN ({marks})", tuple(ids))
+        cursor.execute(f"DELETE FROM attendance_daily WHERE employee_id IN ({marks})", tuple(ids))
+        cursor.execute(f"DELETE FROM employees WHERE employee_id IN ({marks})", tuple(ids))
+        conn.commit()
+
+def per_call(db, ids, threads):
+    for employee_id in ids:
+        db.check_in(employee_id)
+    for employee_id in ids:
+        db.check_out(employee_id)
+
+def batched(db, ids, threads):
+    db.check_in_many(ids)
+    db.check_out_many(ids)
+
+def swipes(db, ids, threads):
+    recorder = SwipeRecorder(db)
+    for action in (recorder.check_in, recorder.check_out):
+        share = [ids[i::threads] for i in range(threads)]
+        workers = [threading.Thread(target=lambda part=part: [action(employee_id) for employee_id in part])
+                   for part in share]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    recorder.close()
+    return recorder.batches
+
+def main():
+    parser = argparse.ArgumentParser(description="Check-in burst benchmark")
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--first-id", type=int, default=900000)
+    args = parser.parse_args()
+
+    db = EmployeeDB()
+    ids = list(range(args.first_id, args.first_id + args.employees))
+    setup(db, ids)
+    try:
+        print(f"{'path':<12}{'seconds':>10}{'rows/s':>10}")
+        for name, run in (("per-call", per_call), ("batched", batched), ("swipes", swipes)):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(db, ids, args.threads)
+            elapsed = time.perf_counter() - start
+            # Each employee writes two rows' worth: the check-in and the check-out
+            print(f"{name:<12}{elapsed:>10.3f}{2 * len(ids) / elapsed:>10.0f}")
+        print(db.pool.stats())
+    finally:
+        cleanup(db, ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# Throughput and latency of every public EmployeeDB operation (plus the
+# reports, archive, swipe recorder and async facade) on a seeded dataset.
+# Runs on the SQLite backend by default, so it needs no MySQL server; pass
+# --mysql to use the database in config.py instead (it must be empty).
+#
+#   python benchmark.py --employees 2000 --days 90 --ops 500
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+import archive
+import config
+import reports
+from async_employee import AsyncEmployeeDB
+from employee import EmployeeDB, SwipeRecorder
+
+DEPARTMENTS = ["fs", "bfs", "hr", "ops", "sales", "it", "legal", "finance"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+def seed(db, employees, days, rng):
+    start = datetime(2024, 1, 1)
+    with db.pool.cursor() as (conn, cursor):
+        cursor.executemany("INSERT INTO employees (employee_id, name, department) VALUES (%s, %s, %s)",
+                           [(i, f"employee{i}", DEPARTMENTS[i % len(DEPARTMENTS)]) for i in range(1, employees + 1)])
+        for day in range(days):
+            rows = []
+            for employee_id in range(1, employees + 1):
+                check_in = start + timedelta(days=day, hours=rng.randint(6, 20), minutes=rng.randint(0, 59))
+                check_out = check_in + timedelta(hours=rng.randint(4, 10), minutes=rng.randint(0, 59))
+                minutes = int((check_out - check_in).total_seconds() // 60)
+                rows.append((employee_id, check_in, check_out, round(minutes / 60, 2)))
+            cursor.executemany("INSERT INTO attendance (employee_id, check_in, check_out, total_hours) "
+                               "VALUES (%s, %s, %s, %s)", rows)
+        conn.commit()
+    reports.rebuild(db)
+
+def measure(name, calls, results):
+    # calls: zero-argument callables, each one operation
+    latencies = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    results.append((name, len(latencies), elapsed, latencies))
+
+def measure_concurrent(name, count, threads, run, results):
+    # run(i) from `threads` threads, `count` operations in total
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(indexes):
+        for i in indexes:
+            start = time.perf_counter()
+            run(i)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(range(t, count, threads),)) for t in range(threads)]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    results.append((name, len(latencies), time.perf_counter() - started, latencies))
+
+def consume(rows):
+    for _ in rows:
+        pass
+
+def run(db, args):
+    rng = random.Random(args.seed)
+    employees = args.employees
+    ops = args.ops
+    ids = lambda count: rng.sample(range(1, employees + 1), min(count, employees))
+    results = []
+    next_id = employees + 1
+
+    new_ids = range(next_id, next_id + ops)
+    measure("add_employee", [lambda i=i: db.add_employee(i, f"new{i}", "fs") for i in new_ids], results)
+    batch = ids(ops)
+    measure("check_in", [lambda i=i: db.check_in(i) for i in batch], results)
+    measure("list_incomplete_attendance", [db.list_incomplete_attendance] * max(ops // 50, 1), results)
+    measure("check_out", [lambda i=i: db.check_out(i) for i in batch], results)
+    batches = [ids(args.batch) for _ in range(max(ops // args.batch, 1))]
+    measure(f"check_in_many ({args.batch})", [lambda b=b: db.check_in_many(b) for b in batches], results)
+    measure(f"check_out_many ({args.batch})", [lambda b=b: db.check_out_many(b) for b in batches], results)
+
+    swipe_ids = ids(ops)
+    recorder = SwipeRecorder(db)
+    measure_concurrent("SwipeRecorder.check_in", len(swipe_ids), args.threads,
+                       lambda i: recorder.check_in(swipe_ids[i]), results)
+    measure_concurrent("SwipeRecorder.check_out", len(swipe_ids), args.threads,
+                       lambda i: recorder.check_out(swipe_ids[i]), results)
+    recorder.close()
+
+    async def async_swipes(action):
+        async with AsyncEmployeeDB(db) as adb:
+            call = adb.check_in if action == "in" else adb.check_out
+            async def timed(employee_id):
+                start = time.perf_counter()
+                await call(employee_id)
+                return time.perf_counter() - start
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(timed(i) for i in swipe_ids))
+            return time.perf_counter() - started, latencies
+    for action in ("in", "out"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, latencies = asyncio.run(async_swipes(action))
+        results.append((f"AsyncEmployeeDB.check_{action}", len(latencies), elapsed, latencies))
+
+    measure("iter_attendance (employee)", [lambda i=i: consume(db.iter_attendance(employee_id=i)) for i in ids(ops)],
+            results)
+    months = [(date(2024, m, 1), date(2024, m + 1, 1)) for m in range(1, 12)]
+    measure("iter_attendance (dept, month)",
+            [lambda d=d, m=m: consume(db.iter_attendance(department=d, start=m[0], end=m[1]))
+             for d, m in zip(DEPARTMENTS * 2, months)][:args.scans], results)
+    measure("show_attendance", [db.show_attendance] * args.scans, results)
+    measure("hours_report (dept, month)",
+            [lambda: reports.hours_report(db, date(2024, 1, 1), date(2024, 12, 31), "month", "department")] * args.scans,
+            results)
+    measure("hours_report (employee, week)",
+            [lambda i=i: reports.hours_report(db, date(2024, 1, 1), date(2024, 3, 31), "week", employee_id=i)
+             for i in ids(ops)], results)
+    measure("reports.rebuild", [lambda: reports.rebuild(db)], results)
+    cutoff = datetime(2024, 1, 1) + timedelta(days=args.days // 2)
+    measure("archive.archive_before", [lambda: archive.archive_before(db, cutoff)], results)
+    measure("iter_attendance_history (employee)",
+            [lambda i=i: consume(db.iter_attendance_history(employee_id=i)) for i in ids(ops)], results)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="EmployeeDB benchmark")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--ops", type=int, default=500, help="operations per point-lookup/write method")
+    parser.add_argument("--scans", type=int, default=3, help="runs of the full-table methods")
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sqlite", help="SQLite file to use (defaults to a temporary file)")
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL database from config.py")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if args.mysql:
+        connect = config.get_connection
+    else:
+        connect = config.sqlite_backend(args.sqlite or os.path.join(workdir, "employees.db"), config.DB_SQLITE_SCHEMA)
+    db = EmployeeDB(config.ConnectionPool(connect=connect, size=args.pool_size),
+                    archive.Archive(os.path.join(workdir, "archive")))
+
+    print(f"Seeding {args.employees} employees x {args.days} days "
+          f"({args.employees * args.days} attendance rows) ...")
+    started = time.perf_counter()
+    seed(db, args.employees, args.days, random.Random(args.seed))
+    print(f"Seeded in {time.perf_counter() - started:.1f} s")
+
+    results = run(db, args)
+    print(f"{'operation':<36}{'ops':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, count, elapsed, latencies in results:
+        print(f"{name:<36}{count:>6}{count / elapsed:>10.1f}{percentile(latencies, 50) * 1000:>10.2f}"
+              f"{percentile(latencies, 95) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}")
+    print(db.pool.stats())
+    db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
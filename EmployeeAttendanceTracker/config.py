@@ -1,9 +1,34 @@
+import os
+import sys
 import mysql.connector
+from mysql.connector import errors
+
+# The connection pool and the SQLite backend live in ../common, shared with
+# the repo's other CLI project
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+from dbpool import ConnectionPool
+from sqlite_backend import sqlite_backend
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",
+    "database": "employeedb"
+}
+
+# Set DB_SQLITE_PATH (a file, or ":memory:") to run against SQLite instead of
+# MySQL, e.g. on a machine without a server. The tables come from
+# DB_SQLITE_SCHEMA the first time the database is opened.
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH")
+DB_SQLITE_SCHEMA = os.getenv("DB_SQLITE_SCHEMA",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_sqlite.sql"))
+
 
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="employeedb"
-    )
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+pool = ConnectionPool(connect=sqlite_backend(DB_SQLITE_PATH, DB_SQLITE_SCHEMA) if DB_SQLITE_PATH else get_connection)
@@ -1,83 +1,347 @@
-from config import get_connection
-from mysql.connector import Error
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+import reports
+from archive import Archive, month_of
+from config import pool as shared_pool
+from mysql.connector import Error, IntegrityError, errorcode
+
+# Rows per multi-row statement in check_in_many / check_out_many
+BATCH_SIZE = 500
+# Rows pulled from the server per fetchmany() by iter_attendance
+FETCH_SIZE = 1000
+
+AttendanceRow = namedtuple("AttendanceRow", "attendance_id employee_id check_in check_out total_hours")
+
+
+def chunks(values, size=BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def placeholders(count):
+    return ", ".join(["%s"] * count)
 
 
 class EmployeeDB:
+    def __init__(self, pool=None, archive=None):
+        self.pool = pool if pool is not None else shared_pool
+        self.archive = archive if archive is not None else Archive()
+
     def add_employee(self,employee_id, name, department):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "insert into employees(employee_id,name,department) values(%s,%s,%s)",
-                (employee_id, name, department)
-            )
-            conn.commit()
-            print(f"Employee name is {name} from {department}")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor() as (conn, cursor):
+                cursor.execute(
+                    "insert into employees(employee_id,name,department) values(%s,%s,%s)",
+                    (employee_id, name, department)
+                )
+                conn.commit()
+                print(f"Employee name is {name} from {department}")
+                return True
         except Error as e:
             print(f"Error: {e}")
+            return False
 
     def check_in(self, employee_id):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO attendance (employee_id, check_in) VALUES (%s, NOW())", (employee_id,))
-            conn.commit()
-            print("Checked in.")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(prepared=True) as (conn, cursor):
+                cursor.execute("INSERT INTO attendance (employee_id, check_in) VALUES (%s, NOW())", (employee_id,))
+                conn.commit()
+                result = "Checked in."
+        except IntegrityError as e:
+            # uq_attendance_open_employee allows one open session per employee
+            result = "Already checked in." if e.errno == errorcode.ER_DUP_ENTRY else f"Error: {e}"
         except Error as e:
-            print("Error:", e)
+            result = f"Error: {e}"
+        print(result)
+        return result
 
     def check_out(self, employee_id):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE attendance SET check_out = NOW(), total_hours = TIMESTAMPDIFF(MINUTE, check_in, NOW()) / 60 WHERE employee_id = %s AND check_out IS NULL",
-                (employee_id,))
-            conn.commit()
-            if cursor.rowcount > 0:
-                print("Checked out.")
-            else:
-                print("No active check-in found.")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(prepared=True) as (conn, cursor):
+                cursor.execute(
+                    "SELECT attendance_id FROM attendance WHERE employee_id = %s AND check_out IS NULL FOR UPDATE",
+                    (employee_id,))
+                attendance_ids = [row[0] for row in cursor.fetchall()]
+                cursor.execute(
+                    "UPDATE attendance SET check_out = NOW(), total_hours = TIMESTAMPDIFF(MINUTE, check_in, NOW()) / 60 WHERE employee_id = %s AND check_out IS NULL",
+                    (employee_id,))
+                closed = cursor.rowcount
+                if closed > 0:
+                    reports.record_closed(cursor, attendance_ids)
+                conn.commit()
+                result = "Checked out." if closed > 0 else "No active check-in found."
+        except Error as e:
+            result = f"Error: {e}"
+        print(result)
+        return result
+
+    def check_in_many(self, employee_ids):
+        # Checks in a whole burst of employees with one multi-row INSERT per
+        # BATCH_SIZE rows and a single commit. Returns {employee_id: result}.
+        employee_ids = list(dict.fromkeys(employee_ids))
+        results = {}
+        try:
+            with self.pool.cursor() as (conn, cursor):
+                known = set()
+                for batch in chunks(employee_ids):
+                    cursor.execute(
+                        f"SELECT employee_id FROM employees WHERE employee_id IN ({placeholders(len(batch))})",
+                        tuple(batch))
+                    known.update(row[0] for row in cursor.fetchall())
+                # One duplicate would fail the whole multi-row INSERT, so
+                # leave out employees who already have an open session
+                open_ids = set()
+                for batch in chunks([employee_id for employee_id in employee_ids if employee_id in known]):
+                    cursor.execute(
+                        "SELECT employee_id FROM attendance WHERE check_out IS NULL "
+                        f"AND employee_id IN ({placeholders(len(batch))})",
+                        tuple(batch))
+                    open_ids.update(row[0] for row in cursor.fetchall())
+                accepted = [employee_id for employee_id in employee_ids if employee_id in known - open_ids]
+                inserted = []
+                for batch in chunks(accepted):
+                    try:
+                        cursor.execute(
+                            "INSERT INTO attendance (employee_id, check_in) VALUES " +
+                            ", ".join(["(%s, NOW())"] * len(batch)),
+                            tuple(batch))
+                        inserted.extend(batch)
+                    except IntegrityError:
+                        # Someone was checked in (or an employee removed)
+                        # since the SELECTs above. Only the failed statement
+                        # is rolled back, so retry this batch row by row and
+                        # skip just the rows that conflict.
+                        for employee_id in batch:
+                            try:
+                                cursor.execute("INSERT INTO attendance (employee_id, check_in) VALUES (%s, NOW())",
+                                               (employee_id,))
+                                inserted.append(employee_id)
+                            except IntegrityError as e:
+                                if e.errno == errorcode.ER_DUP_ENTRY:
+                                    open_ids.add(employee_id)
+                                else:
+                                    known.discard(employee_id)
+                conn.commit()
+            for employee_id in employee_ids:
+                if employee_id not in known:
+                    results[employee_id] = "Employee not found."
+                elif employee_id in open_ids:
+                    results[employee_id] = "Already checked in."
+                else:
+                    results[employee_id] = "Checked in."
+            print(f"Checked in {len(inserted)} of {len(employee_ids)}.")
+        except Error as e:
+            print("Error:", e)
+            results = {employee_id: f"Error: {e}" for employee_id in employee_ids}
+        return results
+
+    def check_out_many(self, employee_ids):
+        # Closes the open sessions of many employees with one UPDATE per
+        # BATCH_SIZE employees and a single commit. Returns {employee_id: result}.
+        employee_ids = list(dict.fromkeys(employee_ids))
+        results = {}
+        try:
+            with self.pool.cursor() as (conn, cursor):
+                open_ids = set()
+                attendance_ids = []
+                for batch in chunks(employee_ids):
+                    cursor.execute(
+                        "SELECT attendance_id, employee_id FROM attendance WHERE check_out IS NULL "
+                        f"AND employee_id IN ({placeholders(len(batch))}) FOR UPDATE",
+                        tuple(batch))
+                    for attendance_id, employee_id in cursor.fetchall():
+                        attendance_ids.append(attendance_id)
+                        open_ids.add(employee_id)
+                closing = [employee_id for employee_id in employee_ids if employee_id in open_ids]
+                for batch in chunks(closing):
+                    cursor.execute(
+                        "UPDATE attendance SET check_out = NOW(), total_hours = TIMESTAMPDIFF(MINUTE, check_in, NOW()) / 60 "
+                        f"WHERE check_out IS NULL AND employee_id IN ({placeholders(len(batch))})",
+                        tuple(batch))
+                for batch in chunks(attendance_ids):
+                    reports.record_closed(cursor, batch)
+                conn.commit()
+            for employee_id in employee_ids:
+                results[employee_id] = "Checked out." if employee_id in open_ids else "No active check-in found."
+            print(f"Checked out {len(closing)} of {len(employee_ids)}.")
         except Error as e:
             print("Error:", e)
+            results = {employee_id: f"Error: {e}" for employee_id in employee_ids}
+        return results
 
     def show_attendance(self):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("select * from attendance")
-            for row in cursor.fetchall():
-                print(row)
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(buffered=False) as (conn, cursor):
+                cursor.execute("SELECT * FROM attendance")
+                rows = cursor.fetchmany(FETCH_SIZE)
+                while rows:
+                    for row in rows:
+                        print(row)
+                    rows = cursor.fetchmany(FETCH_SIZE)
         except Error as e:
             print("Error:", e)
 
+    def iter_attendance(self, employee_id=None, department=None, start=None, end=None, after=None, limit=None):
+        # Yields AttendanceRow in attendance_id order, streamed from an
+        # unbuffered cursor FETCH_SIZE rows at a time, so memory stays flat
+        # however many rows match. start/end bound check_in (end exclusive).
+        # To resume, pass the last attendance_id seen as `after`. Database
+        # errors are raised to the caller rather than printed.
+        query = "SELECT a.attendance_id, a.employee_id, a.check_in, a.check_out, a.total_hours FROM attendance a"
+        conditions = []
+        params = []
+        if department is not None:
+            query += " JOIN employees e ON e.employee_id = a.employee_id"
+            conditions.append("e.department = %s")
+            params.append(department)
+        if employee_id is not None:
+            conditions.append("a.employee_id = %s")
+            params.append(employee_id)
+        if start is not None:
+            conditions.append("a.check_in >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("a.check_in < %s")
+            params.append(end)
+        if after is not None:
+            conditions.append("a.attendance_id > %s")
+            params.append(after)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY a.attendance_id"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        with self.pool.cursor(buffered=False) as (conn, cursor):
+            cursor.execute(query, tuple(params))
+            rows = cursor.fetchmany(FETCH_SIZE)
+            while rows:
+                for row in rows:
+                    yield AttendanceRow(*row)
+                rows = cursor.fetchmany(FETCH_SIZE)
+
+    def iter_attendance_history(self, employee_id=None, department=None, start=None, end=None):
+        # Like iter_attendance, but also covers rows moved to the archive by
+        # archive.archive_before: archived months overlapping the range come
+        # first, then the rows still in the table. A row found in both (the
+        # archive job stopped before deleting it) is yielded once.
+        employee_ids = None if employee_id is None else {employee_id}
+        if department is not None:
+            with self.pool.cursor() as (conn, cursor):
+                cursor.execute("SELECT employee_id FROM employees WHERE department = %s", (department,))
+                in_department = {row[0] for row in cursor.fetchall()}
+            employee_ids = in_department if employee_ids is None else employee_ids & in_department
+        for row in self.archive.select(employee_ids, start, end):
+            yield AttendanceRow(*row)
+
+        archived_months = set(self.archive.months())
+        month_files = {}
+        try:
+            for row in self.iter_attendance(employee_id, department, start, end):
+                month = month_of(row.check_in)
+                if month in archived_months:
+                    if month not in month_files:
+                        month_files[month] = self.archive.open(month)
+                    if month_files[month].contains(row.attendance_id):
+                        continue
+                yield row
+        finally:
+            for month_file in month_files.values():
+                month_file.close()
+
     def list_incomplete_attendance(self):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT e.employee_id, e.name, a.check_in FROM employees e JOIN attendance a ON e.employee_id = a.employee_id WHERE a.check_out IS NULL"
-            )
-            rows = cursor.fetchall()
-            for row in rows:
-                print(row)
-            cursor.close()
-            conn.close()
+            with self.pool.cursor() as (conn, cursor):
+                cursor.execute(
+                    "SELECT e.employee_id, e.name, a.check_in FROM employees e JOIN attendance a ON e.employee_id = a.employee_id WHERE a.check_out IS NULL"
+                )
+                rows = cursor.fetchall()
+                for row in rows:
+                    print(row)
+                return rows
         except Error as e:
             print(f"Error: {e}")
+            return []
 
 
+class SwipeRecorder:
+    # Collects individual badge swipes for up to `window` seconds and writes
+    # them through check_in_many / check_out_many, so a shift-start burst
+    # costs one round trip per batch instead of one per swipe. check_in()
+    # and check_out() block until their batch is written and return the
+    # employee's result.
 
+    def __init__(self, db, window=0.005, max_batch=BATCH_SIZE):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.cond = threading.Condition()
+        self.closed = False
+        self.batches = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
 
+    def check_in(self, employee_id):
+        return self.submit("in", employee_id).result()
+
+    def check_out(self, employee_id):
+        return self.submit("out", employee_id).result()
 
+    def submit(self, action, employee_id):
+        future = Future()
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("SwipeRecorder is closed")
+            self.pending.append((action, employee_id, future))
+            self.cond.notify()
+        return future
 
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
 
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self.pending) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                swipes, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            self._write(swipes)
 
+    def _write(self, swipes):
+        # Consecutive swipes of the same kind go out as one batch; the order
+        # between a check-in and a later check-out is kept
+        start = 0
+        while start < len(swipes):
+            action = swipes[start][0]
+            end = start
+            while end < len(swipes) and swipes[end][0] == action:
+                end += 1
+            # A swipe whose future was cancelled while it waited is dropped;
+            # the rest can no longer be cancelled once they are marked running
+            run = [swipe for swipe in swipes[start:end] if swipe[2].set_running_or_notify_cancel()]
+            start = end
+            if not run:
+                continue
+            write = self.db.check_in_many if action == "in" else self.db.check_out_many
+            try:
+                results = write([employee_id for _, employee_id, _ in run])
+                for _, employee_id, future in run:
+                    future.set_result(results[employee_id])
+            except Exception as e:
+                for _, _, future in run:
+                    future.set_exception(e)
+            self.batches += 1
@@ -0,0 +1,110 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+# Hours reports for payroll, answered from attendance_daily: one row per
+# employee per day holding the minutes worked and the number of sessions
+# (or parts of sessions) that fell on that day. check_out adds each closed
+# session to it in the same transaction, split at midnight, so a month-end
+# run reads O(employees x days) rows instead of the attendance history.
+# Sessions still open are not counted until they are checked out.
+
+PERIODS = ("day", "week", "month")
+GROUPS = ("employee", "department")
+# Rows per multi-row upsert
+UPSERT_BATCH_SIZE = 500
+
+
+def split_session(check_in, check_out):
+    # [(day, minutes)] for a session, cut at each midnight. Minutes are counted
+    # the way TIMESTAMPDIFF(MINUTE, check_in, check_out) counts them (whole
+    # minutes since check_in), so the days add up to the session's total.
+    def minutes_at(moment):
+        return int((moment - check_in).total_seconds() // 60)
+
+    parts = []
+    day_start = check_in
+    while day_start < check_out:
+        next_midnight = datetime.combine(day_start.date() + timedelta(days=1), time())
+        day_end = min(next_midnight, check_out)
+        parts.append((day_start.date(), minutes_at(day_end) - minutes_at(day_start)))
+        day_start = day_end
+    return parts
+
+def daily_totals(sessions):
+    # {(employee_id, day): [minutes, sessions]} for (employee_id, check_in, check_out) rows
+    totals = {}
+    for employee_id, check_in, check_out in sessions:
+        for day, minutes in split_session(check_in, check_out):
+            total = totals.setdefault((employee_id, day), [0, 0])
+            total[0] += minutes
+            total[1] += 1
+    return totals
+
+def upsert_daily(cursor, totals):
+    rows = [(employee_id, day, minutes, sessions) for (employee_id, day), (minutes, sessions) in totals.items()]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        cursor.execute(
+            "INSERT INTO attendance_daily (employee_id, work_date, minutes, sessions) VALUES " +
+            ", ".join(["(%s, %s, %s, %s)"] * len(batch)) +
+            " ON DUPLICATE KEY UPDATE minutes = minutes + VALUES(minutes), sessions = sessions + VALUES(sessions)",
+            tuple(value for row in batch for value in row))
+
+def record_closed(cursor, attendance_ids):
+    # Adds sessions just closed by check_out to the rollup; runs on the
+    # caller's cursor so the caller's commit covers both
+    if not attendance_ids:
+        return
+    cursor.execute(
+        "SELECT employee_id, check_in, check_out FROM attendance "
+        f"WHERE attendance_id IN ({', '.join(['%s'] * len(attendance_ids))}) AND check_out IS NOT NULL",
+        tuple(attendance_ids))
+    upsert_daily(cursor, daily_totals(cursor.fetchall()))
+
+def period_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+def hours_report(db, start, end, period="day", group="employee", employee_id=None, department=None):
+    # [(employee_id or department, period start, hours)] for work days from
+    # start to end inclusive, ordered by key then period
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    if group not in GROUPS:
+        raise ValueError(f"group must be one of {', '.join(GROUPS)}")
+    key = "d.employee_id" if group == "employee" else "e.department"
+    query = (f"SELECT {key}, d.work_date, SUM(d.minutes) FROM attendance_daily d "
+             "JOIN employees e ON e.employee_id = d.employee_id WHERE d.work_date BETWEEN %s AND %s")
+    params = [start, end]
+    if employee_id is not None:
+        query += " AND d.employee_id = %s"
+        params.append(employee_id)
+    if department is not None:
+        query += " AND e.department = %s"
+        params.append(department)
+    query += f" GROUP BY {key}, d.work_date"
+
+    minutes = Counter()
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute(query, tuple(params))
+        for group_key, work_date, day_minutes in cursor.fetchall():
+            if isinstance(work_date, datetime):
+                work_date = work_date.date()
+            elif not isinstance(work_date, date):
+                work_date = date.fromisoformat(str(work_date))
+            minutes[(group_key, period_start(work_date, period))] += int(day_minutes)
+    return [(group_key, start_day, round(total / 60, 2)) for (group_key, start_day), total in sorted(minutes.items())]
+
+def rebuild(db):
+    # Recomputes attendance_daily from every closed session (backfill or
+    # repair). Totals are gathered first, so memory is O(employees x days).
+    sessions = ((row.employee_id, row.check_in, row.check_out) for row in db.iter_attendance() if row.check_out)
+    totals = daily_totals(sessions)
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("DELETE FROM attendance_daily")
+        upsert_daily(cursor, totals)
+        conn.commit()
+    return len(totals)
@@ -0,0 +1,49 @@
+CREATE DATABASE IF NOT EXISTS employeedb;
+USE employeedb;
+
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    department VARCHAR(100)
+);
+
+-- open_employee_id is the employee_id while a session is open and NULL once
+-- it is checked out. Its UNIQUE index allows one open session per employee
+-- (MySQL lets a unique index hold any number of NULLs), so a second check-in
+-- fails with a duplicate-key error instead of needing a lookup first.
+-- ix_attendance_open (check_out, employee_id) serves the
+-- "WHERE employee_id = %s AND check_out IS NULL" lookup in check_out and the
+-- "WHERE check_out IS NULL" scan in list_incomplete_attendance. Both read
+-- only open sessions, so they don't slow down as attendance history grows.
+CREATE TABLE IF NOT EXISTS attendance (
+    attendance_id INT AUTO_INCREMENT PRIMARY KEY,
+    employee_id INT NOT NULL,
+    check_in DATETIME NOT NULL,
+    check_out DATETIME NULL,
+    total_hours DECIMAL(6, 2) NULL,
+    open_employee_id INT AS (CASE WHEN check_out IS NULL THEN employee_id END) STORED,
+    UNIQUE KEY uq_attendance_open_employee (open_employee_id),
+    KEY ix_attendance_open (check_out, employee_id),
+    KEY ix_attendance_employee_check_in (employee_id, check_in),
+    CONSTRAINT fk_attendance_employee FOREIGN KEY (employee_id) REFERENCES employees (employee_id)
+);
+
+-- Minutes worked per employee per day, kept current by check_out (see
+-- reports.py). Sessions that span midnight are split across both days. On an
+-- existing database, fill it once with reports.rebuild(EmployeeDB()).
+CREATE TABLE IF NOT EXISTS attendance_daily (
+    employee_id INT NOT NULL,
+    work_date DATE NOT NULL,
+    minutes INT NOT NULL DEFAULT 0,
+    sessions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (employee_id, work_date),
+    KEY ix_attendance_daily_work_date (work_date),
+    CONSTRAINT fk_attendance_daily_employee FOREIGN KEY (employee_id) REFERENCES employees (employee_id)
+);
+
+-- For an existing attendance table (close any duplicate open sessions first):
+-- ALTER TABLE attendance
+--     ADD COLUMN open_employee_id INT AS (CASE WHEN check_out IS NULL THEN employee_id END) STORED,
+--     ADD UNIQUE KEY uq_attendance_open_employee (open_employee_id),
+--     ADD KEY ix_attendance_open (check_out, employee_id),
+--     ADD KEY ix_attendance_employee_check_in (employee_id, check_in);
@@ -0,0 +1,29 @@
+-- SQLite version of schema.sql, used by config.sqlite_backend() for local
+-- runs, tests and benchmarks without a MySQL server.
+
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    department VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    attendance_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL REFERENCES employees (employee_id),
+    check_in DATETIME NOT NULL,
+    check_out DATETIME NULL,
+    total_hours DECIMAL(6, 2) NULL,
+    open_employee_id INTEGER GENERATED ALWAYS AS (CASE WHEN check_out IS NULL THEN employee_id END) STORED
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_open_employee ON attendance (open_employee_id);
+CREATE INDEX IF NOT EXISTS ix_attendance_open ON attendance (check_out, employee_id);
+CREATE INDEX IF NOT EXISTS ix_attendance_employee_check_in ON attendance (employee_id, check_in);
+
+CREATE TABLE IF NOT EXISTS attendance_daily (
+    employee_id INTEGER NOT NULL REFERENCES employees (employee_id),
+    work_date DATE NOT NULL,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (employee_id, work_date)
+);
+CREATE INDEX IF NOT EXISTS ix_attendance_daily_work_date ON attendance_daily (work_date);
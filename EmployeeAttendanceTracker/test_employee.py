@@ -1,5 +1,17 @@
+import asyncio
 import inspect
+import os
+import threading
+import time
+import pytest
+import archive
+import async_employee
+import config
 import employee
+import reports
+from fakes import fake_pool
+from datetime import date, datetime
+from decimal import Decimal
 
 def test_add_employee_query():
     db=employee.EmployeeDB
@@ -50,4 +62,455 @@ def test_show_attendance_signature():
 
 def test_list_incomplete_attendance_signature():
     sig = inspect.signature(employee.EmployeeDB.list_incomplete_attendance)
-    assert list(sig.parameters.keys()) == ["self"]
\ No newline at end of file
+    assert list(sig.parameters.keys()) == ["self"]
+
+def test_pool_reuses_connections():
+    pool, connections = fake_pool(size=2)
+    db = employee.EmployeeDB(pool)
+    for employee_id in range(5):
+        db.check_in(employee_id)
+        db.check_out(employee_id)
+    db.show_attendance()
+    assert len(connections) == 1
+    assert pool.stats()["created"] == 1
+    assert pool.stats()["idle"] == 1
+
+def test_pool_reuses_prepared_statements():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    for employee_id in range(3):
+        db.check_in(employee_id)
+    stats = pool.stats()
+    assert (stats["prepared_misses"], stats["prepared_hits"]) == (1, 2)
+    assert len([cursor for cursor in connections[0].cursors if cursor.prepared]) == 1
+
+def test_pool_returns_connection_on_error():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.add_employee(1, "a", "b")
+    connections[0].fail = config.errors.IntegrityError("Duplicate entry")
+    db.add_employee(1, "a", "b")
+    assert connections[0].cursors[-1].closed
+    assert pool.stats()["idle"] == 1
+    assert not connections[0].in_transaction
+    # A lost connection is dropped rather than reused
+    connections[0].fail = config.errors.OperationalError("Lost connection")
+    db.show_attendance()
+    assert connections[0].closed
+    assert pool.stats()["open"] == 0
+
+def test_check_in_many_single_insert_and_commit():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = lambda operation, params: [(1,), (3,), (4,)] if "FROM employees" in operation else [(4,)]
+    results = db.check_in_many([1, 2, 3, 1, 4])
+    assert results == {1: "Checked in.", 2: "Employee not found.", 3: "Checked in.", 4: "Already checked in."}
+    statements = [operation for operation, _, _ in connections[0].executed]
+    assert statements[0] == "SELECT employee_id FROM employees WHERE employee_id IN (%s, %s, %s, %s)"
+    assert statements[1] == "SELECT employee_id FROM attendance WHERE check_out IS NULL AND employee_id IN (%s, %s, %s)"
+    assert statements[2] == "INSERT INTO attendance (employee_id, check_in) VALUES (%s, NOW()), (%s, NOW())"
+    assert connections[0].executed[2][1] == (1, 3)
+    assert not connections[0].in_transaction
+
+def test_check_in_many_skips_rows_checked_in_concurrently(capsys):
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+
+    def rows(operation, params):
+        if "FROM employees" in operation:
+            return [(1,), (2,), (3,)]
+        if operation.startswith("INSERT"):
+            # 2 was checked in by another client after the open-session check,
+            # and 3 was deleted
+            if 2 in params:
+                raise config.errors.IntegrityError("Duplicate entry", errno=1062)
+            if 3 in params:
+                raise config.errors.IntegrityError("Cannot add or update a child row", errno=1452)
+        return []
+    connections[0].rows = rows
+    results = db.check_in_many([1, 2, 3])
+    assert results == {1: "Checked in.", 2: "Already checked in.", 3: "Employee not found."}
+    inserts = [params for operation, params, _ in connections[0].executed if operation.startswith("INSERT")]
+    assert inserts == [(1, 2, 3), (1,), (2,), (3,)]
+    assert capsys.readouterr().out == "Checked in 1 of 3.\n"
+    assert not connections[0].in_transaction
+
+def test_check_out_many_reports_missing_sessions():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = lambda operation, params: [(20, 2)] if "FOR UPDATE" in operation else []
+    results = db.check_out_many([1, 2])
+    assert results == {1: "No active check-in found.", 2: "Checked out."}
+    update, params, _ = connections[0].executed[1]
+    assert update.startswith("UPDATE attendance SET check_out = NOW()")
+    assert params == (2,)
+    assert connections[0].executed[2][1] == (20,)
+
+def test_check_in_many_error_reported_per_employee():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].fail = config.errors.DatabaseError("boom")
+    assert db.check_in_many([1, 2]) == {1: "Error: boom", 2: "Error: boom"}
+
+class RecordingDB:
+    def __init__(self):
+        self.calls = []
+
+    def check_in_many(self, employee_ids):
+        self.calls.append(("in", list(employee_ids)))
+        return {employee_id: "Checked in." for employee_id in employee_ids}
+
+    def check_out_many(self, employee_ids):
+        self.calls.append(("out", list(employee_ids)))
+        return {employee_id: "Checked out." for employee_id in employee_ids}
+
+def test_swipe_recorder_coalesces_concurrent_swipes():
+    db = RecordingDB()
+    recorder = employee.SwipeRecorder(db, window=0.2)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, recorder.check_in(i))) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.close()
+    assert results == {i: "Checked in." for i in range(20)}
+    assert len(db.calls) == 1
+    assert sorted(db.calls[0][1]) == list(range(20))
+
+def test_swipe_recorder_keeps_in_out_order():
+    db = RecordingDB()
+    recorder = employee.SwipeRecorder(db, window=0.2)
+    futures = [recorder.submit("in", 1), recorder.submit("in", 2), recorder.submit("out", 1)]
+    assert [future.result() for future in futures] == ["Checked in.", "Checked in.", "Checked out."]
+    recorder.close()
+    assert db.calls == [("in", [1, 2]), ("out", [1])]
+
+def test_duplicate_check_in_rejected(capsys):
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].fail = config.errors.IntegrityError(msg="Duplicate entry '7' for key 'uq_attendance_open_employee'",
+                                                       errno=1062)
+    db.check_in(7)
+    assert capsys.readouterr().out == "Already checked in.\n"
+    assert pool.stats()["idle"] == 1
+
+def test_schema_limits_one_open_session_per_employee():
+    with open(os.path.join(os.path.dirname(__file__), "schema.sql")) as f:
+        schema = f.read()
+    assert "open_employee_id INT AS (CASE WHEN check_out IS NULL THEN employee_id END) STORED" in schema
+    assert "UNIQUE KEY uq_attendance_open_employee (open_employee_id)" in schema
+    assert "KEY ix_attendance_open (check_out, employee_id)" in schema
+
+def test_iter_attendance_filters_and_keyset():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = [(11, 3, "in", "out", 8.0), (12, 3, "in", None, None)]
+    rows = list(db.iter_attendance(employee_id=3, department="fs", start="2024-01-01", end="2025-01-01",
+                                   after=10, limit=100))
+    assert rows[0] == employee.AttendanceRow(11, 3, "in", "out", 8.0)
+    assert rows[1].attendance_id == 12 and rows[1].check_out is None
+    operation, params, _ = connections[0].executed[0]
+    assert operation == (
+        "SELECT a.attendance_id, a.employee_id, a.check_in, a.check_out, a.total_hours FROM attendance a"
+        " JOIN employees e ON e.employee_id = a.employee_id"
+        " WHERE e.department = %s AND a.employee_id = %s AND a.check_in >= %s AND a.check_in < %s"
+        " AND a.attendance_id > %s ORDER BY a.attendance_id LIMIT %s")
+    assert params == ("fs", 3, "2024-01-01", "2025-01-01", 10, 100)
+
+def test_iter_attendance_streams_in_batches(monkeypatch):
+    monkeypatch.setattr(employee, "FETCH_SIZE", 2)
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = [(i, 1, "in", "out", 1.0) for i in range(5)]
+    rows = db.iter_attendance()
+    assert next(rows).attendance_id == 0
+    assert connections[0].fetches == 1
+    assert connections[0].executed[0][0].endswith("FROM attendance a ORDER BY a.attendance_id")
+    # Abandoning the iterator hands the connection back
+    rows.close()
+    assert pool.stats()["idle"] == 1
+    assert [row.attendance_id for row in db.iter_attendance()] == list(range(5))
+    assert connections[0].fetches == 1 + 4
+
+def test_check_out_rolls_up_hours_split_at_midnight():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    def rows(operation, params):
+        if operation.startswith("SELECT attendance_id"):
+            return [(5,)]
+        if operation.startswith("SELECT employee_id, check_in, check_out"):
+            return [(3, datetime(2024, 1, 1, 22, 0, 30), datetime(2024, 1, 2, 6, 30, 10))]
+        return []
+    connections[0].rows = rows
+    db.check_out(3)
+    upsert, params, _ = connections[0].executed[-1]
+    assert upsert.startswith("INSERT INTO attendance_daily (employee_id, work_date, minutes, sessions) VALUES")
+    assert "ON DUPLICATE KEY UPDATE minutes = minutes + VALUES(minutes)" in upsert
+    assert params == (3, date(2024, 1, 1), 119, 1, 3, date(2024, 1, 2), 390, 1)
+    assert not connections[0].in_transaction
+
+def test_split_session_matches_timestampdiff():
+    check_in = datetime(2024, 1, 30, 23, 59, 59)
+    check_out = datetime(2024, 2, 1, 0, 1, 0)
+    parts = reports.split_session(check_in, check_out)
+    assert [day for day, _ in parts] == [date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)]
+    assert sum(minutes for _, minutes in parts) == int((check_out - check_in).total_seconds() // 60)
+
+def test_hours_report_buckets_rollup_rows():
+    pool, connections = fake_pool(size=1)
+    db = employee.EmployeeDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = [("fs", date(2024, 1, 1), 480), ("fs", date(2024, 1, 7), 240),
+                           ("fs", date(2024, 1, 8), 60), ("hr", date(2024, 1, 2), 90)]
+    report = reports.hours_report(db, date(2024, 1, 1), date(2024, 1, 31), period="week", group="department")
+    assert report == [("fs", date(2024, 1, 1), 12.0), ("fs", date(2024, 1, 8), 1.0), ("hr", date(2024, 1, 1), 1.5)]
+    operation, params, _ = connections[0].executed[0]
+    assert operation.startswith("SELECT e.department, d.work_date, SUM(d.minutes) FROM attendance_daily d")
+    assert params == (date(2024, 1, 1), date(2024, 1, 31))
+    with pytest.raises(ValueError):
+        reports.hours_report(db, date(2024, 1, 1), date(2024, 1, 31), period="year")
+
+class SlowDB:
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def check_in(self, employee_id):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        if self.gate is not None:
+            self.gate.wait(5)
+        else:
+            time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+            self.calls.append(employee_id)
+        return "Checked in."
+
+def test_async_facade_bounds_in_flight_calls():
+    db = SlowDB()
+    async def main():
+        async with async_employee.AsyncEmployeeDB(db, workers=2, queue_size=1) as adb:
+            results = await asyncio.gather(*(adb.check_in(i) for i in range(20)))
+            return results
+    assert asyncio.run(main()) == ["Checked in."] * 20
+    assert db.peak == 2
+    assert sorted(db.calls) == list(range(20))
+
+def test_async_facade_cancel_keeps_slot_until_thread_finishes():
+    gate = threading.Event()
+    db = SlowDB(gate)
+    async def main():
+        adb = async_employee.AsyncEmployeeDB(db, workers=1, queue_size=0)
+        first = asyncio.ensure_future(adb.check_in(1))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        second = asyncio.ensure_future(adb.check_in(2))
+        await asyncio.sleep(0.05)
+        # The cancelled call is still running on its thread and holds the slot
+        assert db.calls == [] and not second.done()
+        gate.set()
+        assert await second == "Checked in."
+        assert first.cancelled()
+        await adb.close()
+    asyncio.run(main())
+    assert db.calls == [1, 2]
+
+def test_async_facade_runs_employee_db():
+    pool, connections = fake_pool(size=2)
+    async def main():
+        async with async_employee.AsyncEmployeeDB(employee.EmployeeDB(pool)) as adb:
+            assert adb.workers == 2
+            return await asyncio.gather(adb.check_in(1), adb.add_employee(9, "a", "b"),
+                                        adb.list_incomplete_attendance())
+    assert asyncio.run(main()) == ["Checked in.", True, []]
+
+def test_async_facade_coalesces_swipes():
+    db = RecordingDB()
+    async def main():
+        async with async_employee.AsyncEmployeeDB(db, workers=1, queue_size=99, swipe_window=0.05) as adb:
+            return await asyncio.gather(*(adb.check_in(i) for i in range(100)))
+    assert asyncio.run(main()) == ["Checked in."] * 100
+    assert len(db.calls) == 1
+
+def test_swipe_recorder_drops_cancelled_swipes():
+    db = RecordingDB()
+    recorder = employee.SwipeRecorder(db, window=0.1)
+    cancelled = recorder.submit("in", 1)
+    kept = recorder.submit("in", 2)
+    assert cancelled.cancel()
+    assert kept.result(5) == "Checked in."
+    # The recorder thread is still alive after skipping the cancelled swipe
+    assert recorder.check_out(2) == "Checked out."
+    recorder.close()
+    assert db.calls == [("in", [2]), ("out", [2])]
+
+def test_async_facade_cancelled_swipe_keeps_recorder_running():
+    db = RecordingDB()
+    async def main():
+        async with async_employee.AsyncEmployeeDB(db, workers=1, queue_size=1, swipe_window=0.05) as adb:
+            first = asyncio.ensure_future(adb.check_in(1))
+            second = asyncio.ensure_future(adb.check_in(2))
+            third = asyncio.ensure_future(adb.check_in(3))
+            await asyncio.sleep(0.01)
+            # Two slots: the third swipe waits on the event loop
+            assert len(adb.recorder.pending) == 2
+            first.cancel()
+            assert await second == "Checked in."
+            assert await third == "Checked in."
+            assert first.cancelled()
+            return await adb.check_out(1)
+    assert asyncio.run(main()) == "Checked out."
+    assert db.calls == [("in", [1, 2]), ("in", [3]), ("out", [1])]
+
+def attendance_table(rows):
+    # Fake query results for a small attendance table held in `rows`
+    def run(operation, params):
+        if operation.startswith("SELECT check_in FROM attendance"):
+            closed = sorted(row[2] for row in rows if row[3] is not None and row[2] < params[0])
+            return [(check_in,) for check_in in closed[:1]]
+        if operation.startswith("SELECT a.attendance_id"):
+            start, end = (params[0], params[1]) if "a.check_in >= %s" in operation else (None, None)
+            return [row for row in rows if start is None or start <= row[2] < end]
+        if operation.startswith("DELETE FROM attendance"):
+            deleted = set(params)
+            rows[:] = [row for row in rows if row[0] not in deleted]
+        return []
+    return run
+
+def test_archive_round_trip_and_merge(tmp_path):
+    store = archive.Archive(str(tmp_path))
+    rows = [(1, 3, datetime(2024, 1, 2, 9), datetime(2024, 1, 2, 17), Decimal("8.00")),
+            (2, 4, datetime(2024, 1, 3, 9), datetime(2024, 1, 3, 12, 30), Decimal("3.50"))]
+    assert store.write("2024-01", rows) == 2
+    # Writing an overlapping batch again keeps one copy per attendance_id
+    assert store.write("2024-01", rows[1:] + [(5, 3, datetime(2024, 1, 9, 9), datetime(2024, 1, 9, 10), Decimal("1.00"))]) == 3
+    assert store.months() == ["2024-01"]
+    month_file = store.open("2024-01")
+    assert list(month_file.select())[:2] == rows
+    assert [row[0] for row in month_file.select(employee_ids={3})] == [1, 5]
+    assert [row[0] for row in month_file.select(start=datetime(2024, 1, 3), end=datetime(2024, 1, 4))] == [2]
+    assert month_file.contains(5) and not month_file.contains(4)
+    month_file.close()
+
+def test_archive_select_reads_only_needed_columns(tmp_path):
+    store = archive.Archive(str(tmp_path))
+    store.write("2024-02", [(i, i % 7, datetime(2024, 2, 1 + i % 28, 9), datetime(2024, 2, 1 + i % 28, 17),
+                             Decimal("8.00")) for i in range(1000)])
+    month_file = store.open("2024-02")
+    assert list(month_file.select(employee_ids={99})) == []
+    assert set(month_file.cache) == {"employee_id"}
+    month_file.close()
+
+def test_archive_before_moves_closed_rows_and_history_unions(tmp_path):
+    rows = [(1, 3, datetime(2024, 1, 2, 9), datetime(2024, 1, 2, 17), Decimal("8.00")),
+            (2, 3, datetime(2024, 2, 5, 9), datetime(2024, 2, 5, 17), Decimal("8.00")),
+            (3, 3, datetime(2024, 2, 6, 9), None, None),
+            (4, 3, datetime(2024, 3, 1, 9), datetime(2024, 3, 1, 10), Decimal("1.00"))]
+    table = list(rows)
+    pool, connections = fake_pool(size=2)
+    db = employee.EmployeeDB(pool, archive.Archive(str(tmp_path)))
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = attendance_table(table)
+    assert archive.archive_before(db, datetime(2024, 3, 1)) == {"2024-01": 1, "2024-02": 1}
+    # The open session and the row after the cutoff stay in the table
+    assert [row[0] for row in table] == [3, 4]
+    assert [row.attendance_id for row in db.iter_attendance_history()] == [1, 2, 3, 4]
+    # A row archived but not yet deleted (interrupted job) comes back once
+    table.insert(0, rows[1])
+    history = list(db.iter_attendance_history())
+    assert [row.attendance_id for row in history] == [1, 2, 3, 4]
+    assert history[0] == employee.AttendanceRow(*rows[0])
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    schema = os.path.join(os.path.dirname(__file__), "schema_sqlite.sql")
+    pool = config.ConnectionPool(connect=config.sqlite_backend(":memory:", schema), size=2)
+    db = employee.EmployeeDB(pool, archive.Archive(str(tmp_path / "archive")))
+    for employee_id, name, department in ((1, "tausifa", "fs"), (2, "balaji", "bfs"), (3, "kavya", "fs")):
+        db.add_employee(employee_id, name, department)
+    yield db
+    pool.close_all()
+
+def seed_attendance(db, rows):
+    with db.pool.cursor() as (conn, cursor):
+        cursor.executemany("INSERT INTO attendance (employee_id, check_in, check_out, total_hours) VALUES (%s, %s, %s, %s)",
+                           rows)
+        conn.commit()
+
+def test_sqlite_check_in_out_flow(sqlite_db):
+    db = sqlite_db
+    assert db.check_in(1) == "Checked in."
+    assert db.check_in(1) == "Already checked in."
+    assert db.check_in(99).startswith("Error: ")
+    assert [row[0] for row in db.list_incomplete_attendance()] == [1]
+    assert db.check_out(1) == "Checked out."
+    assert db.check_out(1) == "No active check-in found."
+    assert db.list_incomplete_attendance() == []
+    row, = db.iter_attendance()
+    assert row.employee_id == 1 and row.check_out >= row.check_in and row.total_hours == 0
+    assert db.pool.stats()["open"] <= 2
+
+def test_sqlite_duplicate_maps_to_mysql_error(sqlite_db):
+    with pytest.raises(config.errors.IntegrityError) as raised:
+        with sqlite_db.pool.cursor() as (conn, cursor):
+            cursor.execute("insert into employees(employee_id,name,department) values(%s,%s,%s)", (1, "x", "y"))
+    assert raised.value.errno == 1062
+
+def test_sqlite_batches_and_hours(sqlite_db):
+    db = sqlite_db
+    seed_attendance(db, [(3, datetime(2024, 1, 1, 22, 0), None, None)])
+    assert db.check_in_many([1, 2, 3, 4]) == {1: "Checked in.", 2: "Checked in.", 3: "Already checked in.",
+                                              4: "Employee not found."}
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("UPDATE attendance SET check_in = %s WHERE employee_id = %s AND check_out IS NULL",
+                       (datetime(2024, 1, 1, 9, 0), 1))
+        conn.commit()
+    assert db.check_out_many([1, 3, 2]) == {1: "Checked out.", 3: "Checked out.", 2: "Checked out."}
+    rows = {row.employee_id: row for row in db.iter_attendance()}
+    expected = reports.daily_totals((row.employee_id, row.check_in, row.check_out) for row in rows.values())
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("SELECT employee_id, work_date, minutes, sessions FROM attendance_daily")
+        assert {(r[0], r[1]): [r[2], r[3]] for r in cursor.fetchall()} == expected
+    # The 22:00 check-in of employee 3 is split at midnight
+    assert expected[(3, date(2024, 1, 1))] == [120, 1]
+    minutes = int((rows[3].check_out - rows[3].check_in).total_seconds() // 60)
+    assert abs(float(rows[3].total_hours) - minutes / 60) < 1e-6
+    assert reports.rebuild(db) == len(expected)
+    report = reports.hours_report(db, date(2024, 1, 1), date(2024, 1, 1), group="department")
+    assert report == [("fs", date(2024, 1, 1), 17.0)]
+
+def test_sqlite_iter_filters(sqlite_db):
+    seed_attendance(sqlite_db, [(1, datetime(2024, 1, day, 9), datetime(2024, 1, day, 17), 8) for day in range(1, 11)] +
+                               [(2, datetime(2024, 1, 5, 9), datetime(2024, 1, 5, 17), 8)])
+    rows = list(sqlite_db.iter_attendance(department="fs", start=date(2024, 1, 3), end=date(2024, 1, 6)))
+    assert [(row.employee_id, row.check_in.day) for row in rows] == [(1, 3), (1, 4), (1, 5)]
+    page = list(sqlite_db.iter_attendance(after=rows[0].attendance_id, limit=2))
+    assert [row.attendance_id for row in page] == [rows[0].attendance_id + 1, rows[0].attendance_id + 2]
+
+def test_sqlite_archive_and_history(sqlite_db):
+    db = sqlite_db
+    seed_attendance(db, [(1, datetime(2024, 1, 2, 9), datetime(2024, 1, 2, 17), 8),
+                         (2, datetime(2024, 2, 2, 9), datetime(2024, 2, 2, 13), 4),
+                         (3, datetime(2024, 2, 3, 9), None, None),
+                         (1, datetime(2024, 3, 2, 9), datetime(2024, 3, 2, 10), 1)])
+    assert archive.archive_before(db, date(2024, 3, 1)) == {"2024-01": 1, "2024-02": 1}
+    assert [row.attendance_id for row in db.iter_attendance()] == [3, 4]
+    history = list(db.iter_attendance_history(department="fs"))
+    assert [(row.attendance_id, row.employee_id) for row in history] == [(1, 1), (3, 3), (4, 1)]
+    assert history[0].total_hours == Decimal("8.00")
+    assert [row.attendance_id for row in db.iter_attendance_history(start=date(2024, 2, 1), end=date(2024, 3, 1))] == [2, 3]
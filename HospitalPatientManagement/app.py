@@ -1,65 +1,281 @@
-from flask import Flask, request, jsonify, abort
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+import click
+from flask.cli import with_appcontext
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, abort, stream_with_context
 from flask_jwt_extended import (JWTManager, create_access_token, jwt_required, get_jwt_identity)
-from datetime import datetime
-from enum import Enum
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+from datetime import date, datetime, timedelta
 from config import Config
+from models import db, UserRole, User, Department, Patient, AgeStat
+from cache import TTLCache, ResponseCache
+from hashing import PasswordHasher, HashingBusy
+from search_index import PatientSearchIndex
+from metrics import Metrics
+import bulk_import
+import stats
+
+jwt = JWTManager()
+api = Blueprint('api', __name__)
+
+# Process-wide services, sized from the app config by create_app()
+password_hasher = PasswordHasher()
+user_roles = TTLCache()
+response_cache = ResponseCache()
+patient_search = PatientSearchIndex(('name', 'disease'))
+metrics = Metrics()
+
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    jwt.init_app(app)
+    password_hasher.configure(app.config['PASSWORD_HASH_WORKERS'],
+                              app.config['PASSWORD_HASH_QUEUE_SIZE'],
+                              app.config['PASSWORD_HASH_METHOD'])
+    user_roles.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    response_cache.configure(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+    patient_search.configure(ttl=app.config['PATIENT_SEARCH_INDEX_TTL'] or None)
+    app.register_blueprint(api)
+    metrics.init_app(app, db)
+    app.register_error_handler(HashingBusy, hashing_busy)
+    app.cli.add_command(rebuild_stats_command)
+    return app
+
+def cache_metrics():
+    lines = []
+    for kind, help_text in (('hits', 'Cache lookups answered from memory.'),
+                            ('misses', 'Cache lookups that went to the database.')):
+        lines += [f"# HELP hospital_cache_{kind}_total {help_text}",
+                  f"# TYPE hospital_cache_{kind}_total counter"]
+        for name, cache in (('user_roles', user_roles), ('responses', response_cache)):
+            lines.append(f'hospital_cache_{kind}_total{{cache="{name}"}} {cache.stats()[kind]}')
+    return lines
+
+metrics.add_collector(cache_metrics)
+
+def init_db(app):
+    # One-off setup: tables and the default admin user. The production server
+    # runs this once in the master process before forking workers.
+    with app.app_context():
+        db.create_all()
+        # create_all() leaves existing tables alone; add indexes declared on
+        # the models since those tables were created
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        # Create default admin user if not exists
+        if not User.query.filter_by(username='admin').first():
+            admin_user = User(
+                username='admin',
+                password=password_hasher.hash('1234'),
+                role=UserRole.admin
+            )
+            db.session.add(admin_user)
+            db.session.commit()
+        # First start with the rollup tables: backfill them from the patients
+        if not db.session.query(AgeStat.department_id).first() and db.session.query(Patient.id).first():
+            stats.rebuild()
+        configure_mappers()
+        # Neither connections nor hashing processes may be shared with
+        # forked workers
+        db.engine.dispose()
+    password_hasher.shutdown()
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the statistics rollups from the patients table."""
+    stats.rebuild()
+
+def warm_up(app):
+    # Per-process: open the pool's connections now rather than on the first
+    # requests that need them
+    with app.app_context():
+        engine = db.engine
+        size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+        connections = [engine.connect() for _ in range(size)]
+        for connection in connections:
+            connection.close()
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
-
-# --- Models ---
-
-class UserRole(Enum):
-    doctor = 'doctor'
-    admin = 'admin'
-    staff = 'staff'
-
-class User(db.Model):
-    __tablename__ = 'users'
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    password = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.Enum(UserRole), nullable=False)
-    created_on = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Department(db.Model):
-    __tablename__ = 'departments'
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(100), nullable=False, unique=True)
-    head_doctor = db.Column(db.String(100), nullable=True)
-    created_on = db.Column(db.Date, default=datetime.utcnow)
-
-    patients = db.relationship('Patient', backref='department', lazy=True)
-
-class Patient(db.Model):
-    __tablename__ = 'patients'
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(50), nullable=False)
-    age = db.Column(db.Integer, nullable=False)
-    disease = db.Column(db.String(100), nullable=False)
-    admitted_on = db.Column(db.Date, nullable=False)
-    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
+def shutdown(app):
+    with app.app_context():
+        db.engine.dispose()
+    password_hasher.shutdown()
 
 # --- Helper functions ---
 
+def user_role(username):
+    # Role of a user (None if there is no such user), from the user cache when
+    # possible. Anything that creates or changes a user must call
+    # invalidate_user() afterwards.
+    return user_roles.get_or_load(
+        username, lambda: db.session.query(User.role).filter_by(username=username).scalar())
+
+def invalidate_user(username):
+    user_roles.invalidate(username)
+
 def admin_required(fn):
     @jwt_required()
     def wrapper(*args, **kwargs):
-        current_username = get_jwt_identity()
-        user = User.query.filter_by(username=current_username).first()
-        if not user or user.role != UserRole.admin:
+        if user_role(get_jwt_identity()) != UserRole.admin:
             return jsonify({"msg": "Admin privilege required"}), 403
         return fn(*args, **kwargs)
     wrapper.__name__ = fn.__name__
     return wrapper
 
+def cached_response(group):
+    # Serve a GET endpoint's JSON body from response_cache, with an ETag and
+    # 304 for a matching If-None-Match. The view must always answer 200 with
+    # JSON, and writes that change what it returns must call
+    # response_cache.bump(group).
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            def build():
+                response, _ = fn(*args, **kwargs)
+                return response.get_data()
+            body, etag = response_cache.get(group, request.full_path, build)
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            return response.make_conditional(request)
+        wrapper.__name__ = fn.__name__
+        return wrapper
+    return decorator
+
+# Patient listings select plain columns with the department name joined in,
+# so serializing a page never hydrates ORM objects or lazy-loads departments.
+def patient_rows():
+    return db.session.query(
+        Patient.id,
+        Patient.name,
+        Patient.age,
+        Patient.disease,
+        Patient.admitted_on,
+        Department.name.label('department')
+    ).outerjoin(Department, Patient.department_id == Department.id)
+
+def locked_patient(patient_id):
+    # The patient, row-locked until commit, so a write's stats before-key and
+    # delta come from the row it actually changes. SQLite ignores FOR UPDATE;
+    # a no-op UPDATE takes its database write lock instead.
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(update(Patient).where(Patient.id == patient_id).values(id=Patient.id))
+    return db.session.get(Patient, patient_id, with_for_update=True)
+
+def patient_to_dict(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "age": row.age,
+        "disease": row.disease,
+        "admitted_on": row.admitted_on.isoformat(),
+        "department": row.department
+    }
+
+def patient_listing(query):
+    # Keyset pagination on Patient.id: ?limit=N&after=<last id seen>. The id to
+    # pass as `after` for the next page is returned in the X-Next-After header.
+    # ?stream=json|ndjson sends rows as they come off a server-side cursor
+    # instead of building the whole result list in memory first.
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        after = int(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({"msg": "limit and after must be integers"}), 400
+
+    max_page_size = current_app.config['PATIENTS_MAX_PAGE_SIZE']
+    if limit is not None and not 0 < limit <= max_page_size:
+        return jsonify({"msg": f"limit must be between 1 and {max_page_size}"}), 400
+
+    query = query.order_by(Patient.id)
+    if after is not None:
+        query = query.filter(Patient.id > after)
+
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('json', 'ndjson'):
+            return jsonify({"msg": "stream must be 'json' or 'ndjson'"}), 400
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.yield_per(current_app.config['PATIENTS_STREAM_BATCH_SIZE'])
+        if stream == 'ndjson':
+            body = (json.dumps(patient_to_dict(p)) + '\n' for p in rows)
+            return Response(stream_with_context(body), mimetype='application/x-ndjson')
+        return Response(stream_with_context(stream_json_array(rows)), mimetype='application/json')
+
+    if limit is None:
+        return jsonify([patient_to_dict(p) for p in query]), 200
+
+    # One extra row tells us whether there is a next page
+    patients = query.limit(limit + 1).all()
+    response = jsonify([patient_to_dict(p) for p in patients[:limit]])
+    if len(patients) > limit:
+        response.headers['X-Next-After'] = str(patients[limit - 1].id)
+    return response, 200
+
+def patient_search_listing(field, text):
+    # By default a search is a patient listing like GET /patients: ordered by
+    # id, every match, with ?limit/?after keyset pages and ?stream.
+    # ?rank=1 returns the best matches first instead: at most ?limit results
+    # (PATIENT_SEARCH_LIMIT by default), with X-More-Results: 1 when there
+    # were more. Both find matches with the trigram index, which only sees
+    # other workers' writes once it reloads, after PATIENT_SEARCH_INDEX_TTL
+    # seconds.
+    if request.args.get('rank', '0') in ('0', 'false'):
+        return patient_listing(patient_rows().filter(search_filter(field, text)))
+    if 'after' in request.args or 'stream' in request.args:
+        return jsonify({"msg": "rank can't be combined with after or stream"}), 400
+
+    try:
+        limit = int(request.args.get('limit', current_app.config['PATIENT_SEARCH_LIMIT']))
+    except ValueError:
+        return jsonify({"msg": "limit must be an integer"}), 400
+    max_page_size = current_app.config['PATIENTS_MAX_PAGE_SIZE']
+    if not 0 < limit <= max_page_size:
+        return jsonify({"msg": f"limit must be between 1 and {max_page_size}"}), 400
+
+    # One extra id tells us whether the results were cut off
+    ids = patient_search.search(field, text, limit + 1, load_search_rows)
+    more = len(ids) > limit
+    ids = ids[:limit]
+    rows = patient_rows().filter(Patient.id.in_(ids)).all() if ids else []
+    rank = {patient_id: i for i, patient_id in enumerate(ids)}
+    rows.sort(key=lambda row: rank[row.id])
+    response = jsonify([patient_to_dict(row) for row in rows])
+    if more:
+        response.headers['X-More-Results'] = '1'
+    return response, 200
+
+def search_filter(field, text):
+    # The index's matches are read by primary key. A term matching more than
+    # PATIENT_SEARCH_MAX_IDS patients is left to an ILIKE scan: the listing's
+    # ORDER BY id LIMIT stops that early when matches are that common.
+    max_ids = current_app.config['PATIENT_SEARCH_MAX_IDS']
+    ids = patient_search.search(field, text, max_ids + 1, load_search_rows)
+    if len(ids) > max_ids:
+        return getattr(Patient, field).ilike(f'%{text}%')
+    return Patient.id.in_(ids)
+
+def load_search_rows():
+    return db.session.query(Patient.id, Patient.name, Patient.disease) \
+        .yield_per(current_app.config['PATIENTS_STREAM_BATCH_SIZE'])
+
+def stream_json_array(rows):
+    yield '['
+    for i, p in enumerate(rows):
+        yield (',' if i else '') + json.dumps(patient_to_dict(p))
+    yield ']'
+
+def hashing_busy(e):
+    response = jsonify({"msg": "Server busy, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # --- Routes ---
 
-@app.route('/register', methods=['POST'])
+@api.route('/register', methods=['POST'])
 @admin_required
 def register():
     data = request.get_json()
@@ -74,16 +290,26 @@ def register():
     if role not in UserRole._value2member_map_:
         return jsonify({"msg": "Invalid role"}), 400
 
-    if User.query.filter_by(username=username).first():
-        return jsonify({"msg": "Username already exists"}), 409
-    hashed_password = generate_password_hash(password)
+    # Hand the connection back to the pool (admin_required may have used one)
+    # before the slow hash
+    db.session.close()
+    hashed_password = password_hasher.hash(password)
     new_user = User(username=username, password=hashed_password, role=UserRole(role))
     db.session.add(new_user)
-    db.session.commit()
+    # The unique constraint on username does the duplicate check
+    try:
+        db.session.flush()
+        user_id = new_user.id
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Username already exists"}), 409
+    finally:
+        invalidate_user(username)
 
-    return jsonify({"message": "User   registered successfully", "user_id": new_user.id}), 201
+    return jsonify({"message": "User   registered successfully", "user_id": user_id}), 201
 
-@app.route('/login', methods=['POST'])
+@api.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     if not data:
@@ -95,17 +321,27 @@ def login():
     if not username or not password:
         return jsonify({"msg": "username and password required"}), 400
 
-    user = User.query.filter_by(username=username).first()
-    if not user or not check_password_hash(user.password, password):
+    user = db.session.query(User.username, User.password, User.role).filter_by(username=username).first()
+    # Hand the connection back to the pool before the slow hash check
+    db.session.close()
+    if not user or not password_hasher.verify(user.password, password):
         return jsonify({"msg": "Bad username or password"}), 401
 
+    # The role is about to be needed by the token's first admin request
+    user_roles.set(user.username, user.role)
+
     # Use username as identity instead of user.id
     access_token = create_access_token(identity=user.username)
     return jsonify({"token": access_token}), 200
 
+@api.route('/cache/stats', methods=['GET'])
+@admin_required
+def cache_stats():
+    return jsonify({"user_roles": user_roles.stats(), "responses": response_cache.stats()}), 200
+
 # --- Department APIs ---
 
-@app.route('/departments', methods=['POST'])
+@api.route('/departments', methods=['POST'])
 @admin_required
 def add_department():
     data = request.get_json()
@@ -128,11 +364,13 @@ def add_department():
     new_department = Department(name=name, head_doctor=head_doctor)
     db.session.add(new_department)
     db.session.commit()
+    response_cache.bump('departments')
 
     return jsonify({"message": "Department added successfully", "department_id": new_department.id}), 201
 
-@app.route('/departments', methods=['GET'])
+@api.route('/departments', methods=['GET'])
 @jwt_required()
+@cached_response('departments')
 def list_departments():
     departments = Department.query.all()
     result = []
@@ -147,7 +385,7 @@ def list_departments():
 
 # --- Patient APIs ---
 
-@app.route('/patients', methods=['POST'])
+@api.route('/patients', methods=['POST'])
 @jwt_required()
 def add_patient():
     data = request.get_json()
@@ -181,68 +419,135 @@ def add_patient():
         department_id=department_id
     )
     db.session.add(new_patient)
+    stats.record([(stats.patient_key(new_patient), 1)])
     db.session.commit()
+    patient_search.add(new_patient.id, name=name, disease=disease)
 
     return jsonify({"message": "Patient registered successfully", "patient_id": new_patient.id}), 201
 
-@app.route('/patients', methods=['GET'])
+@api.route('/patients/bulk', methods=['POST'])
+@jwt_required()
+def bulk_add_patients():
+    # Body is NDJSON (one patient object per line) or CSV with a header row,
+    # read as a stream. Rows are validated against the departments loaded
+    # once up front and inserted batch_size at a time, one commit per batch.
+    fmt = bulk_import.FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify({"msg": "Send application/x-ndjson or text/csv"}), 415
+    try:
+        batch_size = int(request.args.get('batch_size', current_app.config['BULK_IMPORT_BATCH_SIZE']))
+    except ValueError:
+        return jsonify({"msg": "batch_size must be an integer"}), 400
+    if not 0 < batch_size <= current_app.config['BULK_IMPORT_MAX_BATCH_SIZE']:
+        return jsonify({"msg": f"batch_size must be between 1 and {current_app.config['BULK_IMPORT_MAX_BATCH_SIZE']}"}), 400
+
+    department_ids = {department_id for (department_id,) in db.session.query(Department.id)}
+    max_errors = current_app.config['BULK_IMPORT_MAX_ERRORS']
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def report(row, msg):
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append({"row": row, "msg": msg})
+
+    def insert_rows(rows):
+        # One INSERT and commit for the rows. If the database rejects them,
+        # the rows are split in half and retried, so that only the offending
+        # rows are reported, each with the database's reason.
+        nonlocal inserted
+        try:
+            db.session.execute(insert(Patient), [values for _, values in rows])
+            stats.record((stats.patient_key(values), 1) for _, values in rows)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if len(rows) == 1:
+                reason = e.orig.args[-1] if getattr(e, 'orig', None) is not None and e.orig.args \
+                    else e.__class__.__name__
+                report(rows[0][0], f"Rejected by the database: {reason}")
+                return
+            middle = len(rows) // 2
+            insert_rows(rows[:middle])
+            insert_rows(rows[middle:])
+        else:
+            inserted += len(rows)
+
+    def insert_batch():
+        insert_rows(list(batch))
+        batch.clear()
+
+    for row, record in bulk_import.read_records(request.stream, fmt):
+        if isinstance(record, ValueError):
+            report(row, str(record))
+            continue
+        try:
+            batch.append((row, bulk_import.patient_values(record, department_ids)))
+        except ValueError as e:
+            report(row, str(e))
+            continue
+        if len(batch) >= batch_size:
+            insert_batch()
+    if batch:
+        insert_batch()
+
+    # New ids aren't known without a round trip per row, so the search index
+    # reloads itself on the next search instead
+    if inserted:
+        patient_search.invalidate()
+
+    return jsonify({"inserted": inserted, "failed": failed, "errors": errors}), 200
+
+def patient_filters():
+    # Optional GET /patients filters; raises ValueError on a malformed value
+    args = request.args
+    filters = []
+    if 'department_id' in args:
+        filters.append(Patient.department_id == int(args['department_id']))
+    if 'admitted_from' in args:
+        filters.append(Patient.admitted_on >= datetime.strptime(args['admitted_from'], '%Y-%m-%d').date())
+    if 'admitted_to' in args:
+        filters.append(Patient.admitted_on <= datetime.strptime(args['admitted_to'], '%Y-%m-%d').date())
+    if 'min_age' in args:
+        filters.append(Patient.age >= int(args['min_age']))
+    if 'max_age' in args:
+        filters.append(Patient.age <= int(args['max_age']))
+    return filters
+
+@api.route('/patients', methods=['GET'])
 @jwt_required()
 def list_patients():
-    patients = Patient.query.all()
-    result = []
-    for p in patients:
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "age": p.age,
-            "disease": p.disease,
-            "admitted_on": p.admitted_on.isoformat(),
-            "department": p.department.name if p.department else None
-        })
-    return jsonify(result), 200
+    try:
+        filters = patient_filters()
+    except ValueError:
+        return jsonify({"msg": "department_id, min_age and max_age must be integers; "
+                               "admitted_from and admitted_to use YYYY-MM-DD"}), 400
+    return patient_listing(patient_rows().filter(*filters))
 
-@app.route('/patients/disease/<string:disease>', methods=['GET'])
+@api.route('/patients/disease/<string:disease>', methods=['GET'])
 @jwt_required()
 def filter_patients_by_disease(disease):
-    patients = Patient.query.filter(Patient.disease.ilike(f'%{disease}%')).all()
-    result = []
-    for p in patients:
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "age": p.age,
-            "disease": p.disease,
-            "admitted_on": p.admitted_on.isoformat(),
-            "department": p.department.name if p.department else None
-        })
-    return jsonify(result), 200
+    return patient_search_listing('disease', disease)
 
-@app.route('/patients/search', methods=['GET'])
+@api.route('/patients/search', methods=['GET'])
 @jwt_required()
 def search_patients_by_name():
     name_query = request.args.get('name')
     if not name_query:
         return jsonify({"msg": "Query parameter 'name' is required"}), 400
 
-    patients = Patient.query.filter(Patient.name.ilike(f'%{name_query}%')).all()
-    result = []
-    for p in patients:
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "age": p.age,
-            "disease": p.disease,
-            "admitted_on": p.admitted_on.isoformat(),
-            "department": p.department.name if p.department else None
-        })
-    return jsonify(result), 200
+    return patient_search_listing('name', name_query)
 
-@app.route('/patients/<int:patient_id>', methods=['PUT'])
+@api.route('/patients/<int:patient_id>', methods=['PUT'])
 @jwt_required()
 def update_patient(patient_id):
-    patient = Patient.query.get(patient_id)
+    patient = locked_patient(patient_id)
     if not patient:
         return jsonify({"msg": "Patient not found"}), 404
+    stats_before = stats.patient_key(patient)
 
     data = request.get_json()
     if not data:
@@ -271,32 +576,98 @@ def update_patient(patient_id):
             return jsonify({"msg": "Department not found"}), 404
         patient.department_id = department_id
 
+    stats_after = stats.patient_key(patient)
+    if stats_after != stats_before:
+        stats.record([(stats_before, -1), (stats_after, 1)])
+    search_values = {"name": patient.name, "disease": patient.disease}
     db.session.commit()
+    patient_search.add(patient_id, **search_values)
     return jsonify({"message": "Patient updated successfully"}), 200
 
-@app.route('/patients/<int:patient_id>', methods=['DELETE'])
+@api.route('/patients/<int:patient_id>', methods=['DELETE'])
 @jwt_required()
 def delete_patient(patient_id):
-    patient = Patient.query.get(patient_id)
+    patient = locked_patient(patient_id)
     if not patient:
         return jsonify({"msg": "Patient not found"}), 404
 
+    stats.record([(stats.patient_key(patient), -1)])
     db.session.delete(patient)
     db.session.commit()
+    patient_search.remove(patient_id)
     return jsonify({"message": "Patient deleted successfully"}), 200
 
-# --- Initialize DB and create admin user for testing ---
+# --- Statistics APIs ---
+
+def stats_department_arg():
+    department_id = request.args.get('department_id')
+    return int(department_id) if department_id is not None else None
+
+@api.route('/stats/census', methods=['GET'])
+@jwt_required()
+def department_census():
+    names = dict(db.session.query(Department.id, Department.name))
+    return jsonify([
+        {"department_id": department_id, "department": names.get(department_id), "patients": int(patients)}
+        for department_id, patients in stats.census()
+    ]), 200
+
+@api.route('/stats/admissions', methods=['GET'])
+@jwt_required()
+def admission_stats():
+    # Admissions per day or per week (weeks start on Monday) between ?from
+    # and ?to inclusive; the last 30 days by default.
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else date.today()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() \
+            if 'from' in request.args else end - timedelta(days=30)
+        department_id = stats_department_arg()
+    except ValueError:
+        return jsonify({"msg": "Use YYYY-MM-DD for from/to and an integer department_id"}), 400
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'week'):
+        return jsonify({"msg": "interval must be 'day' or 'week'"}), 400
+    if start > end:
+        return jsonify({"msg": "from must not be after to"}), 400
+
+    return jsonify([
+        {"period": period.isoformat(), "admissions": int(patients)}
+        for period, patients in stats.admissions(start, end, interval, department_id)
+    ]), 200
+
+@api.route('/stats/ages', methods=['GET'])
+@jwt_required()
+def age_stats():
+    try:
+        bucket = int(request.args.get('bucket', 10))
+        department_id = stats_department_arg()
+    except ValueError:
+        return jsonify({"msg": "bucket and department_id must be integers"}), 400
+    if bucket < 1:
+        return jsonify({"msg": "bucket must be at least 1"}), 400
+
+    return jsonify([
+        {"from": start, "to": start + bucket - 1, "patients": int(patients)}
+        for start, patients in stats.ages(bucket, department_id)
+    ]), 200
+
+@api.route('/stats/diseases', methods=['GET'])
+@jwt_required()
+def disease_stats():
+    try:
+        department_id = stats_department_arg()
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({"msg": "department_id and limit must be integers"}), 400
+
+    return jsonify([
+        {"disease": disease, "patients": int(patients)}
+        for disease, patients in stats.diseases(department_id, limit)
+    ]), 200
+
+# --- Development server ---
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # Create default admin user if not exists
-        if not User.query.filter_by(username='admin').first():
-            admin_user = User(
-                username='admin',
-                password=generate_password_hash('1234'),
-                role=UserRole.admin
-            )
-            db.session.add(admin_user)
-            db.session.commit()
+    app = create_app()
+    init_db(app)
     app.run(debug=True)
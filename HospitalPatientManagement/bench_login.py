@@ -0,0 +1,133 @@
+# Login storm benchmark: many clients log in at once while a probe client
+# keeps calling GET /departments. Runs once with hashing inline on the
+# request threads and once with the process pool, against a throwaway
+# SQLite database and an in-process threaded server.
+#
+#   python bench_login.py [--clients N] [--seconds S] [--workers W]
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def request(conn, method, path, body=None, headers=None):
+    headers = dict(headers or {})
+    if body is not None:
+        body = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+def run(clients, seconds):
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app, db, password_hasher
+    from models import User, UserRole
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password=password_hasher.hash('1234'), role=UserRole.admin))
+        for i in range(clients):
+            db.session.add(User(username=f'nurse{i}', password=password_hasher.hash('pw'), role=UserRole.staff))
+        db.session.commit()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    _, body = request(conn, 'POST', '/login', {"username": "admin", "password": "1234"})
+    token = {"Authorization": f"Bearer {json.loads(body)['token']}"}
+
+    stop = threading.Event()
+    login_latency, statuses, probe_latency = [], [], []
+
+    def storm(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        while not stop.is_set():
+            start = time.perf_counter()
+            status, _ = request(conn, 'POST', '/login', {"username": f"nurse{i}", "password": "pw"})
+            login_latency.append(time.perf_counter() - start)
+            statuses.append(status)
+
+    def probe():
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        while not stop.is_set():
+            start = time.perf_counter()
+            request(conn, 'GET', '/departments', headers=token)
+            probe_latency.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=storm, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    password_hasher.shutdown()
+
+    ok = statuses.count(200)
+    return {
+        "logins_per_sec": ok / seconds,
+        "login_p50_ms": percentile(login_latency, 50) * 1000,
+        "login_p99_ms": percentile(login_latency, 99) * 1000,
+        "busy_503": statuses.count(503),
+        "probe_p50_ms": percentile(probe_latency, 50) * 1000,
+        "probe_p95_ms": percentile(probe_latency, 95) * 1000,
+        "probe_p99_ms": percentile(probe_latency, 99) * 1000,
+        "probe_max_ms": max(probe_latency) * 1000 if probe_latency else 0.0,
+        "probe_mean_ms": statistics.mean(probe_latency) * 1000 if probe_latency else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.clients, args.seconds)))
+        return
+
+    # Each mode runs in its own interpreter since the hasher is configured
+    # from the environment at import time
+    results = {}
+    for label, workers in (('inline', 0), (f'pool x{args.workers}', args.workers)):
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}",
+                   PASSWORD_HASH_WORKERS=str(workers))
+        out = subprocess.run([sys.executable, __file__, '--child', '--clients', str(args.clients),
+                              '--seconds', str(args.seconds)],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        results[label] = json.loads(out.strip().splitlines()[-1])
+
+    keys = list(next(iter(results.values())))
+    print(f"{'':>16}" + ''.join(f"{label:>14}" for label in results))
+    for key in keys:
+        print(f"{key:>16}" + ''.join(f"{result[key]:>14.1f}" for result in results.values()))
+
+
+if __name__ == '__main__':
+    main()
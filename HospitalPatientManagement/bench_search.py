@@ -0,0 +1,86 @@
+# Patient search latency vs. table size: the trigram index against the
+# ilike('%x%') scan it replaces. Runs against a throwaway SQLite database.
+#
+#   python bench_search.py [sizes...]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_FILE}'
+
+from datetime import date
+from app import create_app, db, patient_rows, load_search_rows
+from models import Department, Patient
+from search_index import PatientSearchIndex
+
+SYLLABLES = ['an', 'na', 'ra', 'vi', 'jo', 'li', 'ma', 'ri', 'om', 'ar', 'pri', 'ya', 'ken', 'ji',
+             'ku', 'sa', 'to', 'fe', 'lo', 'da', 'mi', 'zu', 'bo', 'te', 'shi', 'go', 'ha', 'el']
+DISEASES = ['influenza', 'asthma', 'diabetes', 'hypertension', 'malaria', 'dengue', 'migraine']
+# From a full-name lookup down to a two-letter fragment found in a third of the names
+QUERIES = [('name', 'kenjo mazu'), ('name', 'pritoha'), ('name', 'zubo'), ('name', 'ri'),
+           ('disease', 'betes')]
+REPEAT = 20
+
+app = create_app()
+
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+def seed(count, rng):
+    db.drop_all()
+    db.create_all()
+    db.session.add(Department(name='General'))
+    db.session.flush()
+    rows = [{
+        "name": f'{word(rng)} {word(rng)}',
+        "age": rng.randint(1, 99),
+        "disease": rng.choice(DISEASES),
+        "admitted_on": date(2024, 1, 1),
+        "department_id": 1
+    } for _ in range(count)]
+    db.session.execute(Patient.__table__.insert(), rows)
+    db.session.commit()
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+def main(sizes):
+    rng = random.Random(42)
+    limit = app.config['PATIENT_SEARCH_LIMIT']
+    print(f"{'rows':>8} {'field':>8} {'query':>12} {'matches':>8} {'ilike ms':>10} {'index ms':>10} {'speedup':>8}")
+    with app.app_context():
+        for size in sizes:
+            seed(size, rng)
+            index = PatientSearchIndex(('name', 'disease'))
+            start = time.perf_counter()
+            index.ensure_loaded(load_search_rows)
+            build_ms = (time.perf_counter() - start) * 1000
+            for field, text in QUERIES:
+                column = getattr(Patient, field)
+
+                # The ilike path as it stood: every match, in id order
+                def scan():
+                    return patient_rows().filter(column.ilike(f'%{text}%')).order_by(Patient.id).all()
+
+                def indexed():
+                    ids = index.search(field, text, limit, load_search_rows)
+                    if ids:
+                        patient_rows().filter(Patient.id.in_(ids)).all()
+
+                matches = len(scan())
+                scan_ms, index_ms = timed(scan), timed(indexed)
+                print(f"{size:>8} {field:>8} {text:>12} {matches:>8} {scan_ms:>10.2f} {index_ms:>10.2f} "
+                      f"{scan_ms / index_ms:>7.1f}x")
+            print(f"{size:>8} index build: {build_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,287 @@
+# Load test for the hospital REST API. Boots the app against a throwaway
+# SQLite database (or --database-url, e.g. a local MySQL), seeds departments,
+# patients and users, then drives concurrent clients through a weighted mix
+# of logins, listings, searches, stats reads and patient create/update/delete.
+# Prints throughput and latency percentiles per endpoint and compares them
+# with a saved baseline so regressions in hot routes show up as a diff.
+#
+#   python benchmark.py                      # run and compare with the baseline
+#   python benchmark.py --save-baseline      # run and record a new baseline
+#   python benchmark.py --patients 200000 --clients 32 --seconds 60
+#
+# A --database-url database must have no tables: the run would otherwise
+# drop them. Pass --drop-existing to allow that (never on real data).
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'benchmark_baseline.json')
+
+# (endpoint label, relative weight)
+MIX = [
+    ('GET /patients?limit', 20),
+    ('GET /patients filtered', 10),
+    ('GET /patients/search', 20),
+    ('GET /patients/disease', 10),
+    ('GET /departments', 15),
+    ('GET /stats/census', 5),
+    ('GET /stats/admissions', 5),
+    ('POST /patients', 6),
+    ('PUT /patients/<id>', 5),
+    ('DELETE /patients/<id>', 3),
+    ('POST /login', 1),
+]
+DISEASES = ['influenza', 'asthma', 'diabetes', 'hypertension', 'malaria', 'dengue', 'migraine', 'gout']
+SYLLABLES = ['an', 'na', 'ra', 'vi', 'jo', 'li', 'ma', 'ri', 'om', 'ar', 'pri', 'ya', 'ken', 'ji',
+             'ku', 'sa', 'to', 'fe', 'lo', 'da', 'mi', 'zu', 'bo', 'te', 'shi', 'go', 'ha', 'el']
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+def random_date(rng):
+    return f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+
+def seed(app, args, rng):
+    from datetime import date
+    from sqlalchemy import inspect
+    from app import db, password_hasher
+    from models import Department, Patient, User, UserRole
+    import stats
+
+    with app.app_context():
+        tables = inspect(db.engine).get_table_names()
+        if tables and args.database_url and not args.drop_existing:
+            sys.exit(f"{args.database_url} already has tables ({', '.join(sorted(tables))}); "
+                     "the benchmark would drop them. Use an empty database or pass --drop-existing.")
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Department.__table__.insert(), [
+            {"name": f'Department {i}', "head_doctor": f'Dr {word(rng)}', "created_on": date(2024, 1, 1)}
+            for i in range(args.departments)])
+        pwhash = password_hasher.hash('pw')
+        db.session.execute(User.__table__.insert(), [
+            {"username": 'admin', "password": pwhash, "role": UserRole.admin}] + [
+            {"username": f'user{i}', "password": pwhash, "role": UserRole.staff} for i in range(args.users)])
+        for start in range(0, args.patients, 10000):
+            db.session.execute(Patient.__table__.insert(), [{
+                "name": f'{word(rng)} {word(rng)}',
+                "age": rng.randint(1, 99),
+                "disease": rng.choice(DISEASES),
+                "admitted_on": date(2024, rng.randint(1, 12), rng.randint(1, 28)),
+                "department_id": rng.randint(1, args.departments)
+            } for _ in range(start, min(start + 10000, args.patients))])
+        db.session.commit()
+        stats.rebuild()
+        db.session.remove()
+
+class Client:
+    def __init__(self, port, index, args, seed_value):
+        import http.client
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.rng = random.Random(seed_value)
+        self.username = f'user{index % max(args.users, 1)}' if args.users else 'admin'
+        self.args = args
+        self.created = []
+        self.headers = {}
+
+    def request(self, method, path, body=None):
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        return response.status, response.read()
+
+    def login(self):
+        status, body = self.request('POST', '/login', {"username": self.username, "password": 'pw'})
+        if status == 200:
+            self.headers = {"Authorization": f"Bearer {json.loads(body)['token']}"}
+        return status
+
+    def run(self, label):
+        rng = self.rng
+        args = self.args
+        if label == 'POST /login':
+            return self.login()
+        if label == 'GET /patients?limit':
+            return self.request('GET', f'/patients?limit=50&after={rng.randint(0, args.patients)}')[0]
+        if label == 'GET /patients filtered':
+            month = rng.randint(1, 12)
+            return self.request('GET', f'/patients?department_id={rng.randint(1, args.departments)}'
+                                       f'&admitted_from=2024-{month:02d}-01&admitted_to=2024-{month:02d}-28'
+                                       f'&limit=50')[0]
+        if label == 'GET /patients/search':
+            return self.request('GET', f'/patients/search?name={word(rng)[:rng.randint(3, 6)]}&rank=1')[0]
+        if label == 'GET /patients/disease':
+            return self.request('GET', f'/patients/disease/{rng.choice(DISEASES)[:5]}?limit=50&rank=1')[0]
+        if label == 'GET /departments':
+            return self.request('GET', '/departments')[0]
+        if label == 'GET /stats/census':
+            return self.request('GET', '/stats/census')[0]
+        if label == 'GET /stats/admissions':
+            return self.request('GET', '/stats/admissions?from=2024-01-01&to=2024-12-31&interval=week')[0]
+        if label == 'POST /patients':
+            status, body = self.request('POST', '/patients', {
+                "name": f'{word(rng)} {word(rng)}', "age": rng.randint(1, 99), "disease": rng.choice(DISEASES),
+                "admitted_on": random_date(rng), "department_id": rng.randint(1, args.departments)})
+            if status == 201:
+                self.created.append(json.loads(body)["patient_id"])
+            return status
+        if label == 'PUT /patients/<id>':
+            patient_id = rng.choice(self.created) if self.created else rng.randint(1, args.patients)
+            return self.request('PUT', f'/patients/{patient_id}',
+                                {"age": rng.randint(1, 99), "disease": rng.choice(DISEASES)})[0]
+        if label == 'DELETE /patients/<id>':
+            if not self.created:
+                return None
+            return self.request('DELETE', f'/patients/{self.created.pop()}')[0]
+        raise ValueError(label)
+
+def drive(port, args):
+    labels = [label for label, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    results = {label: {"latency": [], "errors": 0} for label in labels}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(index):
+        client = Client(port, index, args, args.seed + index)
+        client.login()
+        while not stop.is_set():
+            label = client.rng.choices(labels, weights)[0]
+            start = time.perf_counter()
+            status = client.run(label)
+            elapsed = time.perf_counter() - start
+            if status is None:
+                continue
+            with lock:
+                results[label]["latency"].append(elapsed)
+                if status >= 400:
+                    results[label]["errors"] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {label: {
+        "requests": len(result["latency"]),
+        "rps": round(len(result["latency"]) / args.seconds, 1),
+        "p50_ms": round(percentile(result["latency"], 50) * 1000, 1),
+        "p95_ms": round(percentile(result["latency"], 95) * 1000, 1),
+        "p99_ms": round(percentile(result["latency"], 99) * 1000, 1),
+        "errors": result["errors"]
+    } for label, result in results.items() if result["latency"]}
+
+def report(results, baseline, threshold):
+    # Prints the results, with the change against the baseline when there is
+    # one, and returns the endpoints that regressed beyond `threshold`
+    regressions = []
+    header = f"{'endpoint':<26}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    if baseline:
+        header += f"{'req/s vs base':>15}{'p95 vs base':>13}"
+    print(header)
+    for label, result in results.items():
+        line = (f"{label:<26}{result['requests']:>8}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+                f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['errors']:>8}")
+        base = baseline.get(label) if baseline else None
+        if base:
+            rps_change = result['rps'] / base['rps'] - 1 if base['rps'] else 0.0
+            p95_change = result['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0.0
+            flag = ''
+            if rps_change < -threshold or p95_change > threshold:
+                flag = '  REGRESSION'
+                regressions.append(label)
+            line += f"{rps_change:>+14.0%}{p95_change:>+13.0%}{flag}"
+        print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the hospital REST API")
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='an empty database; defaults to a temporary SQLite file')
+    parser.add_argument('--drop-existing', action='store_true',
+                        help='drop the tables already in --database-url before seeding')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative req/s drop or p95 rise that counts as a regression')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    # Cheap hashes so logins measure the API rather than the KDF
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    os.environ.setdefault('METRICS_SLOW_REQUEST_MS', '60000')
+
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app, shutdown
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    print(f"Seeding {args.departments} departments, {args.patients} patients, {args.users} users ...")
+    seed(app, args, rng)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Driving {args.clients} clients for {args.seconds:.0f} s ...")
+    try:
+        results = drive(server.server_port, args)
+    finally:
+        server.shutdown()
+        shutdown(app)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        if saved["config"] != run_config(args):
+            print(f"Note: baseline was recorded with {saved['config']}")
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({"config": run_config(args), "machine": machine(), "results": results}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+    elif regressions:
+        print(f"Regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+def run_config(args):
+    return {key: getattr(args, key) for key in ('departments', 'patients', 'users', 'clients', 'seconds', 'seed')} | {
+        "database": 'sqlite' if not args.database_url else args.database_url.split(':', 1)[0]}
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+if __name__ == '__main__':
+    main()
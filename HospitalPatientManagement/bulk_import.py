@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import datetime
+from functools import lru_cache
+from models import Patient
+
+# Checked here so an over-long value is reported for its row instead of
+# failing its whole batch in the database
+NAME_LENGTH = Patient.__table__.c.name.type.length
+DISEASE_LENGTH = Patient.__table__.c.disease.type.length
+# Signed 32-bit INT columns
+INT_RANGE = range(-2 ** 31, 2 ** 31)
+
+FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonlines': 'ndjson',
+    'text/csv': 'csv'
+}
+
+
+def read_records(stream, fmt):
+    # Yields (row number, record) pairs straight off the request body. A row
+    # that can't be decoded is yielded as a ValueError instead of a record so
+    # the caller can report it and carry on.
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        for row_number, record in enumerate(csv.DictReader(text), start=1):
+            yield row_number, record
+        return
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = ValueError("Invalid JSON")
+        if not isinstance(record, (dict, ValueError)):
+            record = ValueError("Each line must be a JSON object")
+        yield row_number, record
+
+@lru_cache(maxsize=4096)
+def parse_date(value):
+    # An import is mostly a handful of distinct admission dates repeated
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def patient_values(record, department_ids):
+    name = record.get('name')
+    age = record.get('age')
+    disease = record.get('disease')
+    admitted_on = record.get('admitted_on')
+    department_id = record.get('department_id')
+
+    if not all([name, age, disease, admitted_on, department_id]):
+        raise ValueError("All patient fields are required")
+    if not isinstance(name, str) or not isinstance(disease, str):
+        raise ValueError("name and disease must be strings")
+    if len(name) > NAME_LENGTH:
+        raise ValueError(f"name must be at most {NAME_LENGTH} characters")
+    if len(disease) > DISEASE_LENGTH:
+        raise ValueError(f"disease must be at most {DISEASE_LENGTH} characters")
+    try:
+        age = int(age)
+        department_id = int(department_id)
+    except (TypeError, ValueError):
+        raise ValueError("age and department_id must be integers")
+    if age not in INT_RANGE:
+        raise ValueError("age is out of range")
+    if department_id not in department_ids:
+        raise ValueError("Department not found")
+    try:
+        admitted_date = parse_date(admitted_on)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date format for admitted_on, use YYYY-MM-DD")
+
+    return {
+        "name": name,
+        "age": age,
+        "disease": disease,
+        "admitted_on": admitted_date,
+        "department_id": department_id
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    # Bounded in-process cache: least recently used entries are dropped once
+    # `maxsize` is reached and every entry expires `ttl` seconds after it was
+    # stored. Callers invalidate keys explicitly when the source data changes.
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, maxsize, ttl):
+        with self.lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.entries.clear()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, load):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=MISSING):
+        with self.lock:
+            if key is MISSING:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class ResponseCache:
+    # Serialized response bodies for rarely-changing read endpoints. Each
+    # cached endpoint belongs to a named group whose version is bumped by the
+    # writes that affect it; a body built for an older version (or older than
+    # `ttl` seconds, which bounds staleness from writes in other processes) is
+    # rebuilt on the next request. The ETag is a digest of the body, so it
+    # stays valid across processes that built the same content independently.
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.versions = {}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, maxsize, ttl):
+        with self.lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.entries.clear()
+
+    def bump(self, group):
+        with self.lock:
+            self.versions[group] = self.versions.get(group, 0) + 1
+
+    def get(self, group, key, build):
+        now = time.monotonic()
+        with self.lock:
+            version = self.versions.get(group, 0)
+            entry = self.entries.get((group, key))
+            if entry is not None and entry[0] == version and entry[3] > now:
+                self.entries.move_to_end((group, key))
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+        body = build()
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            # Only keep it if no write bumped the version while building
+            if self.versions.get(group, 0) == version:
+                self.entries[(group, key)] = (version, body, etag, now + self.ttl)
+                self.entries.move_to_end((group, key))
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return body, etag
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "versions": dict(self.versions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,33 @@
+# Production server: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is imported once in the master (preload_app), which also creates
+# the tables and the admin user and configures the mappers before forking.
+# Each worker then opens its own connection pool; nothing that holds a socket
+# is shared across the fork.
+
+import multiprocessing
+import os
+
+from app import init_db, warm_up, shutdown
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# Recycle workers now and then to cap any slow memory growth
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    init_db(server.app.wsgi())
+
+def post_fork(server, worker):
+    warm_up(server.app.wsgi())
+
+def worker_exit(server, worker):
+    shutdown(server.app.wsgi())
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # Runs password hashing in a pool of worker processes so the CPU-heavy KDF
+    # neither holds the GIL nor ties up request threads beyond waiting on the
+    # result. At most `workers + queue_size` hashes are in flight; past that
+    # HashingBusy is raised straight away instead of queueing more work.
+    # workers=0 hashes inline on the calling thread (tests, single-user tools).
+    # Workers are started by a fork server where the platform has one, so they
+    # aren't forked from a threaded server process; if one dies (OOM killer,
+    # SIGKILL) the broken pool is replaced and the call retried once.
+
+    def __init__(self, workers=0, queue_size=0, method='scrypt'):
+        self.executor = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.configure(workers, queue_size, method)
+
+    def configure(self, workers, queue_size, method):
+        self.shutdown()
+        self.workers = workers
+        self.method = method
+        self.slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            executor = self._executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self._discard(executor)
+                return self._executor().submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def _executor(self):
+        # Created on first use, and again after a fork, so that pre-forked
+        # server workers each run their own pool rather than the parent's.
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                context = multiprocessing.get_context(
+                    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None)
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self.pid = os.getpid()
+            return self.executor
+
+    def _discard(self, executor):
+        # Drops a broken pool, unless another thread already replaced it
+        with self.lock:
+            if self.executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
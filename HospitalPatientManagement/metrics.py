@@ -0,0 +1,162 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# How much of each statement a slow-request log line shows
+SLOW_LOG_STATEMENTS = 20
+SLOW_LOG_STATEMENT_CHARS = 300
+
+
+class RouteStats:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.statuses = Counter()
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th request, as
+        # Prometheus' histogram_quantile() does
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, in_bucket in enumerate(self.buckets):
+            if seen + in_bucket >= rank and in_bucket:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                if i == len(BUCKETS):
+                    return lower
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+        return BUCKETS[-1]
+
+
+class Metrics:
+    # Per-route request latency and SQL statement counts for one process,
+    # served in Prometheus text format at /metrics. With METRICS_ENABLED off
+    # none of the request or SQLAlchemy hooks are installed at all.
+
+    def __init__(self):
+        self.routes = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.slow_seconds = None
+
+    def init_app(self, app, db):
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.slow_seconds = app.config['METRICS_SLOW_REQUEST_MS'] / 1000
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def add_collector(self, collect):
+        # collect() returns extra exposition lines to append to /metrics
+        self.collectors.append(collect)
+
+    def start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = []
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_sql' in g:
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if starts and has_request_context() and 'metrics_sql' in g:
+            g.metrics_sql.append((statement, time.perf_counter() - starts.pop()))
+
+    def finish_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        statements = g.pop('metrics_sql', [])
+        sql_seconds = sum(seconds for _, seconds in statements)
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        key = (request.method, route)
+
+        with self.lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            stats.buckets[bisect.bisect_left(BUCKETS, elapsed)] += 1
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.statements += len(statements)
+            stats.sql_seconds += sql_seconds
+            stats.statuses[response.status_code] += 1
+
+        if elapsed >= self.slow_seconds:
+            shown = '\n'.join(f"  {seconds * 1000:.1f} ms  {' '.join(statement.split())[:SLOW_LOG_STATEMENT_CHARS]}"
+                              for statement, seconds in statements[:SLOW_LOG_STATEMENTS])
+            current_app.logger.warning(
+                "Slow request %s %s: %.0f ms, %d SQL statements taking %.0f ms\n%s",
+                request.method, request.full_path, elapsed * 1000, len(statements), sql_seconds * 1000, shown)
+        return response
+
+    def view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def render(self):
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = [
+                "# HELP hospital_request_duration_seconds Request latency up to the first byte of the response.",
+                "# TYPE hospital_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in routes:
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for bound, in_bucket in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += in_bucket
+                    lines.append(f'hospital_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'hospital_request_duration_seconds_sum{{{labels}}} {stats.seconds}')
+                lines.append(f'hospital_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            lines += [
+                "# HELP hospital_request_duration_quantile_seconds Latency quantiles estimated from the histogram.",
+                "# TYPE hospital_request_duration_quantile_seconds gauge",
+            ]
+            for (method, route), stats in routes:
+                for q in QUANTILES:
+                    lines.append(f'hospital_request_duration_quantile_seconds{{method="{method}",route="{route}",'
+                                 f'quantile="{q}"}} {stats.quantile(q)}')
+
+            lines += [
+                "# HELP hospital_requests_total Requests by route and status.",
+                "# TYPE hospital_requests_total counter",
+            ]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'hospital_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP hospital_sql_statements_total SQL statements executed while serving requests.",
+                "# TYPE hospital_sql_statements_total counter",
+            ]
+            lines += [f'hospital_sql_statements_total{{method="{method}",route="{route}"}} {stats.statements}'
+                      for (method, route), stats in routes]
+            lines += [
+                "# HELP hospital_sql_seconds_total Time spent executing SQL while serving requests.",
+                "# TYPE hospital_sql_seconds_total counter",
+            ]
+            lines += [f'hospital_sql_seconds_total{{method="{method}",route="{route}"}} {stats.sql_seconds}'
+                      for (method, route), stats in routes]
+
+        for collect in self.collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,66 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from enum import Enum
+
+db = SQLAlchemy()
+
+# --- Models ---
+
+class UserRole(Enum):
+    doctor = 'doctor'
+    admin = 'admin'
+    staff = 'staff'
+
+class User(db.Model):
+    __tablename__ = 'users'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    password = db.Column(db.String(255), nullable=False)
+    role = db.Column(db.Enum(UserRole), nullable=False)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Department(db.Model):
+    __tablename__ = 'departments'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    head_doctor = db.Column(db.String(100), nullable=True)
+    created_on = db.Column(db.Date, default=datetime.utcnow)
+
+    patients = db.relationship('Patient', backref='department', lazy=True)
+
+class Patient(db.Model):
+    __tablename__ = 'patients'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(50), nullable=False)
+    age = db.Column(db.Integer, nullable=False)
+    disease = db.Column(db.String(100), nullable=False)
+    admitted_on = db.Column(db.Date, nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
+
+    # Serve the GET /patients filters (department + admission date range, or
+    # either one alone) from index ranges instead of scanning the table
+    __table_args__ = (
+        db.Index('ix_patients_department_admitted', 'department_id', 'admitted_on'),
+        db.Index('ix_patients_admitted_on', 'admitted_on'),
+        db.Index('ix_patients_age', 'age'),
+    )
+
+# --- Statistics rollups (maintained by stats.py) ---
+
+class AdmissionStat(db.Model):
+    __tablename__ = 'admission_stats'
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    admitted_on = db.Column(db.Date, primary_key=True)
+    patients = db.Column(db.Integer, nullable=False, default=0)
+
+class AgeStat(db.Model):
+    __tablename__ = 'age_stats'
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    age = db.Column(db.Integer, primary_key=True)
+    patients = db.Column(db.Integer, nullable=False, default=0)
+
+class DiseaseStat(db.Model):
+    __tablename__ = 'disease_stats'
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    disease = db.Column(db.String(100), primary_key=True)
+    patients = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,164 @@
+import heapq
+import threading
+import time
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    # In-memory substring index: every trigram of a document points at the ids
+    # containing it, so a query only has to look at the intersection of the
+    # posting lists of its own trigrams instead of every document.
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        text = normalize(text)
+        self.docs[doc_id] = text
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        text = self.docs.pop(doc_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def candidates(self, query):
+        grams = trigrams(query)
+        if not grams:
+            # Shorter than a trigram: nothing to intersect, check every document
+            return self.docs.keys()
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+    def search(self, query, limit=None):
+        query = normalize(query)
+        if not query:
+            return []
+        scored = []
+        for doc_id in self.candidates(query):
+            text = self.docs[doc_id]
+            position = text.find(query)
+            if position < 0:
+                continue
+            # Exact match, then prefix, then start of a word, then anywhere;
+            # earlier and shorter matches first within each group.
+            if text == query:
+                kind = 0
+            elif position == 0:
+                kind = 1
+            else:
+                word_start = text.find(' ' + query, position - 1)
+                if word_start >= 0:
+                    kind, position = 2, word_start + 1
+                else:
+                    kind = 3
+            scored.append((kind, position, len(text), doc_id))
+        if limit is not None:
+            scored = heapq.nsmallest(limit, scored)
+        else:
+            scored.sort()
+        return [doc_id for *_, doc_id in scored]
+
+
+class PatientSearchIndex:
+    # One TrigramIndex per searchable patient field. The index is built from
+    # the database on first use and kept in sync by the write routes; it is
+    # rebuilt after `ttl` seconds so writes made by other processes show up.
+
+    def __init__(self, fields, ttl=None):
+        self.fields = fields
+        self.ttl = ttl
+        self.indexes = None
+        self.built_at = None
+        self.generation = 0
+        self.pending = None
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def configure(self, ttl):
+        self.ttl = ttl
+        self.invalidate()
+
+    def search(self, field, query, limit, load):
+        self.ensure_loaded(load)
+        with self.lock:
+            return self.indexes[field].search(query, limit)
+
+    def fresh(self):
+        return self.indexes is not None and (
+            self.ttl is None or time.monotonic() - self.built_at < self.ttl)
+
+    def ensure_loaded(self, load):
+        if self.fresh():
+            return
+        # Keep answering from the current index while another thread refreshes
+        # it; only wait when there is no index at all yet
+        if not self.build_lock.acquire(blocking=self.indexes is None):
+            return
+        try:
+            if self.fresh():
+                return
+            with self.lock:
+                self.pending = []
+                generation = self.generation
+            indexes = {field: TrigramIndex() for field in self.fields}
+            for row in load():
+                for field in self.fields:
+                    indexes[field].add(row.id, getattr(row, field))
+            with self.lock:
+                # Replay writes that happened while the rows were being read
+                for doc_id, values in self.pending:
+                    self._apply(indexes, doc_id, values)
+                self.indexes = indexes
+                # An invalidate() during the load means the rows may predate it
+                self.built_at = time.monotonic() if generation == self.generation else float('-inf')
+        finally:
+            with self.lock:
+                self.pending = None
+            self.build_lock.release()
+
+    def add(self, doc_id, **values):
+        self._record(doc_id, values)
+
+    def remove(self, doc_id):
+        self._record(doc_id, None)
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            if self.indexes is not None:
+                self.built_at = float('-inf')
+
+    def _record(self, doc_id, values):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((doc_id, values))
+            if self.indexes is not None:
+                self._apply(self.indexes, doc_id, values)
+
+    def _apply(self, indexes, doc_id, values):
+        for field, index in indexes.items():
+            if values is None:
+                index.remove(doc_id)
+            else:
+                index.add(doc_id, values[field])
@@ -0,0 +1,93 @@
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Patient, AdmissionStat, AgeStat, DiseaseStat
+
+# Per-department rollups of the patients table, kept current by the patient
+# write routes in the same transaction as the write itself, so dashboard
+# queries read O(departments x days) summary rows instead of every patient.
+
+ROLLUPS = (
+    (AdmissionStat, ('department_id', 'admitted_on')),
+    (AgeStat, ('department_id', 'age')),
+    (DiseaseStat, ('department_id', 'disease')),
+)
+
+
+def patient_key(patient):
+    # The stats-relevant fields of a patient, from a model instance or a dict
+    get = patient.get if isinstance(patient, dict) else lambda field: getattr(patient, field)
+    return (int(get('department_id')), get('admitted_on'), int(get('age')), get('disease'))
+
+def record(changes):
+    # Apply (patient_key, delta) pairs to the rollup tables in the current
+    # session; the caller's commit makes them part of the same transaction.
+    counts = {model: Counter() for model, _ in ROLLUPS}
+    for (department_id, admitted_on, age, disease), delta in changes:
+        counts[AdmissionStat][(department_id, admitted_on)] += delta
+        counts[AgeStat][(department_id, age)] += delta
+        counts[DiseaseStat][(department_id, disease)] += delta
+    for model, key_columns in ROLLUPS:
+        increment(model, key_columns, counts[model])
+
+def increment(model, key_columns, counts):
+    rows = [dict(zip(key_columns, key), patients=delta) for key, delta in counts.items() if delta]
+    if not rows:
+        return
+    table = model.__table__
+    if db.session.get_bind().dialect.name == 'mysql':
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(patients=table.c.patients + stmt.inserted.patients)
+    else:
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns),
+                                          set_={"patients": table.c.patients + stmt.excluded.patients})
+    db.session.execute(stmt)
+
+def rebuild():
+    # Recompute every rollup from the patients table (backfill or repair)
+    for model, key_columns in ROLLUPS:
+        db.session.execute(model.__table__.delete())
+        columns = [getattr(Patient, column) for column in key_columns]
+        rows = [dict(zip(key_columns, row[:-1]), patients=row[-1])
+                for row in db.session.query(*columns, func.count()).group_by(*columns)]
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def census():
+    return db.session.query(AgeStat.department_id, func.sum(AgeStat.patients)) \
+        .group_by(AgeStat.department_id).having(func.sum(AgeStat.patients) > 0).all()
+
+def admissions(start, end, interval, department_id=None):
+    query = db.session.query(AdmissionStat.admitted_on, func.sum(AdmissionStat.patients)) \
+        .filter(AdmissionStat.admitted_on.between(start, end))
+    if department_id is not None:
+        query = query.filter(AdmissionStat.department_id == department_id)
+    totals = Counter()
+    for day, patients in query.group_by(AdmissionStat.admitted_on):
+        if interval == 'week':
+            day -= timedelta(days=day.weekday())
+        totals[day] += patients
+    return sorted((period, patients) for period, patients in totals.items() if patients)
+
+def ages(bucket, department_id=None):
+    query = db.session.query(AgeStat.age, func.sum(AgeStat.patients))
+    if department_id is not None:
+        query = query.filter(AgeStat.department_id == department_id)
+    totals = Counter()
+    for age, patients in query.group_by(AgeStat.age):
+        totals[age // bucket * bucket] += patients
+    return sorted((start, patients) for start, patients in totals.items() if patients)
+
+def diseases(department_id=None, limit=None):
+    total = func.sum(DiseaseStat.patients)
+    query = db.session.query(DiseaseStat.disease, total)
+    if department_id is not None:
+        query = query.filter(DiseaseStat.department_id == department_id)
+    query = query.group_by(DiseaseStat.disease).having(total > 0).order_by(total.desc(), DiseaseStat.disease)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
@@ -0,0 +1,497 @@
+import json
+import os
+import threading
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+
+from hashing import PasswordHasher, HashingBusy
+import stats
+from config import Config
+from app import create_app, db, metrics, patient_search, password_hasher, response_cache, user_roles
+from models import User, UserRole, Department, Patient
+from datetime import date
+
+
+app = create_app()
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password=generate_password_hash('1234'), role=UserRole.admin))
+        cardiology = Department(name='Cardiology')
+        db.session.add(cardiology)
+        db.session.flush()
+        for i in range(25):
+            db.session.add(Patient(name=f'patient {i}', age=30 + i, disease='flu' if i % 2 else 'asthma',
+                                   admitted_on=date(2024, 1, 1), department_id=cardiology.id))
+        db.session.commit()
+    patient_search.invalidate()
+    user_roles.invalidate()
+    response_cache.bump('departments')
+    with app.test_client() as client:
+        yield client
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def auth(client):
+    token = client.post('/login', json={"username": "admin", "password": "1234"}).get_json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@contextmanager
+def count_queries(with_parameters=False):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters) if with_parameters else statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def add_patients(count):
+    with app.app_context():
+        department = Department(name=f'Ward {count}')
+        db.session.add(department)
+        db.session.flush()
+        for i in range(count):
+            db.session.add(Patient(name=f'extra {i}', age=40, disease='flu',
+                                   admitted_on=date(2024, 2, 1), department_id=department.id))
+        db.session.commit()
+
+
+def test_list_patients_unpaginated(client):
+    response = client.get('/patients', headers=auth(client))
+    assert response.status_code == 200
+    assert len(response.get_json()) == 25
+    assert 'X-Next-After' not in response.headers
+
+def test_list_patients_keyset_pages(client):
+    headers = auth(client)
+    seen = []
+    after = None
+    while True:
+        url = '/patients?limit=10' + (f'&after={after}' if after else '')
+        response = client.get(url, headers=headers)
+        page = response.get_json()
+        seen.extend(p["id"] for p in page)
+        after = response.headers.get('X-Next-After')
+        if after is None:
+            break
+        assert int(after) == page[-1]["id"]
+    assert seen == sorted(seen)
+    assert len(seen) == 25
+
+def test_list_patients_rejects_bad_limit(client):
+    headers = auth(client)
+    assert client.get('/patients?limit=abc', headers=headers).status_code == 400
+    assert client.get('/patients?limit=0', headers=headers).status_code == 400
+    assert client.get('/patients?limit=100000', headers=headers).status_code == 400
+
+def test_search_patients_paginated(client):
+    response = client.get('/patients/search?name=patient&limit=5&after=5', headers=auth(client))
+    assert [p["id"] for p in response.get_json()] == [6, 7, 8, 9, 10]
+
+def test_search_keeps_keyset_contract(client):
+    headers = auth(client)
+    add_patients(120)
+    response = client.get('/patients/search?name=patient&limit=10', headers=headers)
+    assert [p["id"] for p in response.get_json()] == list(range(1, 11))
+    assert response.headers['X-Next-After'] == '10'
+    # Without a limit every match comes back, not a ranked top N
+    assert len(client.get('/patients/disease/flu', headers=headers).get_json()) == 132
+
+def test_stream_json_array(client):
+    response = client.get('/patients/disease/flu?stream=json', headers=auth(client))
+    assert response.is_streamed
+    patients = json.loads(response.get_data(as_text=True))
+    assert len(patients) == 12
+    assert all(p["department"] == 'Cardiology' for p in patients)
+
+def test_stream_ndjson(client):
+    response = client.get('/patients?stream=ndjson&limit=3', headers=auth(client))
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
+
+@pytest.mark.parametrize('url', [
+    '/patients',
+    '/patients?limit=10',
+    '/patients?stream=json',
+    '/patients/disease/flu',
+    '/patients/search?name=e',
+    '/patients/search?name=e&rank=1',
+])
+def test_listing_query_count_is_constant(client, url):
+    headers = auth(client)
+    client.get(url, headers=headers).get_data()
+    with count_queries() as before:
+        client.get(url, headers=headers).get_data()
+    add_patients(40)
+    with count_queries() as after:
+        response = client.get(url, headers=headers)
+        response.get_data()
+    assert response.status_code == 200
+    assert len(after) == len(before)
+
+def test_search_ranks_by_relevance(client):
+    headers = auth(client)
+    for name in ['Anna Smith', 'Joanna Lee', 'Ann', 'Dianne Ann']:
+        client.post('/patients', headers=headers, json={
+            "name": name, "age": 50, "disease": "gout", "admitted_on": "2024-03-01", "department_id": 1})
+    response = client.get('/patients/search?name=ann&rank=1', headers=headers)
+    assert [p["name"] for p in response.get_json()] == ['Ann', 'Anna Smith', 'Dianne Ann', 'Joanna Lee']
+    assert 'X-More-Results' not in response.headers
+    response = client.get('/patients/search?name=ann&rank=1&limit=2', headers=headers)
+    assert [p["name"] for p in response.get_json()] == ['Ann', 'Anna Smith']
+    assert response.headers['X-More-Results'] == '1'
+    assert client.get('/patients/search?name=ann&rank=1&after=1', headers=headers).status_code == 400
+
+def test_search_index_follows_writes(client):
+    headers = auth(client)
+    def ranked(disease):
+        return [p["id"] for p in client.get(f'/patients/disease/{disease}?rank=1', headers=headers).get_json()]
+    assert ranked('malaria') == []
+    patient_id = client.post('/patients', headers=headers, json={
+        "name": "Ravi", "age": 33, "disease": "Malaria", "admitted_on": "2024-03-01",
+        "department_id": 1}).get_json()["patient_id"]
+    assert ranked('malaria') == [patient_id]
+
+    client.put(f'/patients/{patient_id}', headers=headers, json={"disease": "dengue"})
+    assert ranked('malaria') == []
+    assert ranked('DENG') == [patient_id]
+
+    client.delete(f'/patients/{patient_id}', headers=headers)
+    assert ranked('dengue') == []
+
+def test_search_matches_ilike(client):
+    headers = auth(client)
+    for query in ['t 1', 'atient 2', 'p', 'xyz']:
+        ranked = client.get(f'/patients/search?name={query}&rank=1&limit=1000', headers=headers).get_json()
+        listed = client.get(f'/patients/search?name={query}', headers=headers).get_json()
+        with app.app_context():
+            scanned = [patient.id for patient in
+                       Patient.query.filter(Patient.name.ilike(f'%{query}%')).order_by(Patient.id)]
+        assert sorted(p["id"] for p in ranked) == [p["id"] for p in listed] == scanned
+
+def test_search_uses_index_unless_term_is_common(client, monkeypatch):
+    headers = auth(client)
+    with count_queries() as statements:
+        response = client.get('/patients/search?name=patient 1&limit=3', headers=headers)
+    assert [p["id"] for p in response.get_json()] == [2, 11, 12]
+    assert response.headers['X-Next-After'] == '12'
+    assert not any('LIKE' in statement for statement in statements)
+    monkeypatch.setitem(app.config, 'PATIENT_SEARCH_MAX_IDS', 5)
+    with count_queries() as statements:
+        response = client.get('/patients/search?name=patient 1&limit=3', headers=headers)
+    assert [p["id"] for p in response.get_json()] == [2, 11, 12]
+    assert any('LIKE' in statement for statement in statements)
+
+def test_admin_role_lookup_is_cached(client):
+    headers = auth(client)
+    client.get('/cache/stats', headers=headers)
+    with count_queries() as statements:
+        response = client.get('/cache/stats', headers=headers)
+    assert statements == []
+    stats = response.get_json()["user_roles"]
+    assert stats["hits"] >= 1
+
+def test_register_invalidates_cached_role(client):
+    with app.app_context():
+        boss = {"Authorization": f"Bearer {create_access_token(identity='boss')}"}
+    assert client.get('/cache/stats', headers=boss).status_code == 403
+    response = client.post('/register', headers=auth(client),
+                           json={"username": "boss", "password": "pw", "role": "admin"})
+    assert response.status_code == 201
+    assert client.get('/cache/stats', headers=boss).status_code == 200
+
+def test_register_duplicate_username(client):
+    response = client.post('/register', headers=auth(client),
+                           json={"username": "admin", "password": "pw", "role": "staff"})
+    assert response.status_code == 409
+
+def test_password_hasher_process_pool():
+    hasher = PasswordHasher(workers=1, queue_size=0, method='pbkdf2:sha256:1000')
+    try:
+        pwhash = hasher.hash('secret')
+        assert pwhash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(pwhash, 'secret')
+        assert not hasher.verify(pwhash, 'wrong')
+    finally:
+        hasher.shutdown()
+
+def test_password_hasher_recovers_from_dead_worker():
+    hasher = PasswordHasher(workers=1, queue_size=0, method='pbkdf2:sha256:1000')
+    try:
+        pwhash = hasher.hash('secret')
+        broken = hasher.executor
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+        assert hasher.verify(pwhash, 'secret')
+        assert hasher.executor is not broken
+        assert hasher.verify(hasher.hash('again'), 'again')
+    finally:
+        hasher.shutdown()
+
+def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(workers=0, queue_size=0, method='pbkdf2:sha256:1000')
+    hasher.slots.acquire()
+    with pytest.raises(HashingBusy):
+        hasher.hash('secret')
+    hasher.slots.release()
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+
+def test_login_returns_503_when_hashing_saturated(client):
+    taken = 0
+    while password_hasher.slots.acquire(blocking=False):
+        taken += 1
+    try:
+        response = client.post('/login', json={"username": "admin", "password": "1234"})
+    finally:
+        for _ in range(taken):
+            password_hasher.slots.release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/login', json={"username": "admin", "password": "1234"}).status_code == 200
+
+def test_bulk_import_ndjson(client):
+    headers = auth(client)
+    lines = [json.dumps({"name": f"bulk {i}", "age": 20, "disease": "measles",
+                         "admitted_on": "2024-05-01", "department_id": 1}) for i in range(7)]
+    lines.insert(2, json.dumps({"name": "nowhere", "age": 20, "disease": "measles",
+                                "admitted_on": "2024-05-01", "department_id": 99}))
+    lines.insert(4, '{not json')
+    with count_queries() as statements:
+        response = client.post('/patients/bulk?batch_size=3', headers=headers,
+                               data='\n'.join(lines), content_type='application/x-ndjson')
+    body = response.get_json()
+    assert body["inserted"] == 7
+    assert body["errors"] == [{"row": 3, "msg": "Department not found"}, {"row": 5, "msg": "Invalid JSON"}]
+    assert sum(s.lstrip().startswith('INSERT INTO patients') for s in statements) == 3
+    names = [p["name"] for p in client.get('/patients/disease/measles', headers=headers).get_json()]
+    assert len(names) == 7
+
+def test_bulk_import_csv(client):
+    data = "name,age,disease,admitted_on,department_id\n" \
+           "Ravi,33,gout,2024-05-02,1\n" \
+           "Mina,abc,gout,2024-05-02,1\n" \
+           "Omar,41,gout,02/05/2024,1\n"
+    response = client.post('/patients/bulk', headers=auth(client), data=data, content_type='text/csv')
+    body = response.get_json()
+    assert body["inserted"] == 1
+    assert [e["row"] for e in body["errors"]] == [2, 3]
+
+def test_bulk_import_validates_lengths_and_types(client):
+    lines = [json.dumps({"name": "x" * 51, "age": 20, "disease": "gout", "admitted_on": "2024-05-01",
+                         "department_id": 1}),
+             json.dumps({"name": ["x"], "age": 20, "disease": "gout", "admitted_on": "2024-05-01",
+                         "department_id": 1}),
+             json.dumps({"name": "Ravi", "age": 2 ** 40, "disease": "gout", "admitted_on": "2024-05-01",
+                         "department_id": 1})]
+    response = client.post('/patients/bulk', headers=auth(client), data='\n'.join(lines),
+                           content_type='application/x-ndjson')
+    assert response.get_json()["errors"] == [
+        {"row": 1, "msg": "name must be at most 50 characters"},
+        {"row": 2, "msg": "name and disease must be strings"},
+        {"row": 3, "msg": "age is out of range"}]
+
+def test_bulk_import_isolates_rows_the_database_rejects(client):
+    headers = auth(client)
+    with app.app_context():
+        db.session.execute(db.text("CREATE TRIGGER reject_bad BEFORE INSERT ON patients WHEN NEW.name = 'bad' "
+                                   "BEGIN SELECT RAISE(ABORT, 'bad name'); END"))
+        db.session.commit()
+    lines = [json.dumps({"name": "bad" if i == 2 else f"bulk {i}", "age": 20, "disease": "mumps",
+                         "admitted_on": "2024-05-01", "department_id": 1}) for i in range(7)]
+    response = client.post('/patients/bulk?batch_size=4', headers=headers,
+                           data='\n'.join(lines), content_type='application/x-ndjson')
+    body = response.get_json()
+    assert body["inserted"] == 6
+    assert body["errors"] == [{"row": 3, "msg": "Rejected by the database: bad name"}]
+    assert len(client.get('/patients/disease/mumps', headers=headers).get_json()) == 6
+
+def test_bulk_import_rejects_unknown_format(client):
+    response = client.post('/patients/bulk', headers=auth(client), json=[{"name": "x"}])
+    assert response.status_code == 415
+
+def test_departments_etag_and_304(client):
+    headers = auth(client)
+    first = client.get('/departments', headers=headers)
+    etag = first.headers['ETag']
+    assert [d["name"] for d in first.get_json()] == ['Cardiology']
+
+    with count_queries() as statements:
+        cached = client.get('/departments', headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert statements == []
+
+    client.post('/departments', headers=headers, json={"name": "Oncology"})
+    changed = client.get('/departments', headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert [d["name"] for d in changed.get_json()] == ['Cardiology', 'Oncology']
+
+def stats_snapshot(client, headers):
+    return {
+        "census": client.get('/stats/census', headers=headers).get_json(),
+        "admissions": client.get('/stats/admissions?from=2024-01-01&to=2024-12-31', headers=headers).get_json(),
+        "weeks": client.get('/stats/admissions?from=2024-01-01&to=2024-12-31&interval=week',
+                            headers=headers).get_json(),
+        "ages": client.get('/stats/ages?bucket=5', headers=headers).get_json(),
+        "diseases": client.get('/stats/diseases', headers=headers).get_json(),
+    }
+
+def test_stats_rollups_follow_writes(client):
+    headers = auth(client)
+    with app.app_context():
+        stats.rebuild()
+    client.post('/departments', headers=headers, json={"name": "Oncology"})
+    patient_id = client.post('/patients', headers=headers, json={
+        "name": "Ravi", "age": 61, "disease": "leukemia", "admitted_on": "2024-01-03",
+        "department_id": 2}).get_json()["patient_id"]
+    client.put(f'/patients/{patient_id}', headers=headers, json={"age": 62, "admitted_on": "2024-01-08"})
+    client.delete('/patients/3', headers=headers)
+    client.post('/patients/bulk', headers=headers, content_type='application/x-ndjson', data='\n'.join(
+        json.dumps({"name": f"b{i}", "age": 70, "disease": "flu", "admitted_on": "2024-01-08",
+                    "department_id": 2}) for i in range(3)))
+
+    incremental = stats_snapshot(client, headers)
+    with app.app_context():
+        stats.rebuild()
+    assert stats_snapshot(client, headers) == incremental
+
+    assert incremental["census"] == [
+        {"department_id": 1, "department": "Cardiology", "patients": 24},
+        {"department_id": 2, "department": "Oncology", "patients": 4}]
+    assert incremental["admissions"] == [{"period": "2024-01-01", "admissions": 24},
+                                         {"period": "2024-01-08", "admissions": 4}]
+    assert incremental["weeks"] == [{"period": "2024-01-01", "admissions": 24},
+                                    {"period": "2024-01-08", "admissions": 4}]
+    assert incremental["diseases"][0] == {"disease": "flu", "patients": 15}
+    assert {"from": 70, "to": 74, "patients": 3} in incremental["ages"]
+
+def test_stats_rollups_survive_concurrent_updates_and_deletes(tmp_path):
+    # A file database, so each request thread has its own connection and
+    # concurrent writers really contend for the patient rows
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'hospital.db'}"
+    file_app = create_app(FileConfig)
+    with file_app.app_context():
+        db.create_all()
+        db.session.add(Department(name='Cardiology'))
+        db.session.flush()
+        for i in range(10):
+            db.session.add(Patient(name=f'patient {i}', age=30, disease='flu',
+                                   admitted_on=date(2024, 1, 1), department_id=1))
+        db.session.commit()
+        stats.rebuild()
+        headers = {"Authorization": f"Bearer {create_access_token(identity='admin')}"}
+    start = threading.Barrier(8)
+    def worker(n):
+        with file_app.test_client() as client:
+            start.wait()
+            for patient_id in range(1, 11):
+                if patient_id <= 5:
+                    client.put(f'/patients/{patient_id}', headers=headers, json={"age": 40 + n})
+                else:
+                    client.delete(f'/patients/{patient_id}', headers=headers)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with file_app.app_context():
+        patients = db.session.query(Patient).count()
+        assert patients == 5
+        assert [(department_id, int(total)) for department_id, total in stats.census()] == [(1, patients)]
+        ages = stats.ages(100)
+        stats.rebuild()
+        assert stats.ages(100) == ages == [(0, patients)]
+        db.session.remove()
+        db.engine.dispose()
+
+def test_stats_reads_do_not_scan_patients(client):
+    headers = auth(client)
+    with count_queries() as statements:
+        stats_snapshot(client, headers)
+    assert not any('FROM patients' in statement for statement in statements)
+
+def test_admission_stats_validates_range(client):
+    headers = auth(client)
+    assert client.get('/stats/admissions?from=2024-02-01&to=2024-01-01', headers=headers).status_code == 400
+    assert client.get('/stats/admissions?interval=month', headers=headers).status_code == 400
+
+def test_metrics_endpoint(client):
+    headers = auth(client)
+    client.get('/patients', headers=headers)
+    client.get('/nope', headers=headers)
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'hospital_request_duration_seconds_count{method="GET",route="/patients"}' in body
+    assert 'hospital_request_duration_quantile_seconds{method="GET",route="/patients",quantile="0.99"}' in body
+    assert 'hospital_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'hospital_cache_hits_total{cache="user_roles"}' in body
+    statements = [line for line in body.splitlines()
+                  if line.startswith('hospital_sql_statements_total{method="GET",route="/patients"}')]
+    assert int(statements[0].split()[-1]) >= 1
+
+def test_slow_requests_are_logged_with_sql(client, caplog):
+    headers = auth(client)
+    slow_seconds = metrics.slow_seconds
+    metrics.slow_seconds = 0
+    try:
+        client.get('/patients?limit=1', headers=headers)
+    finally:
+        metrics.slow_seconds = slow_seconds
+    assert any('Slow request GET /patients?limit=1' in r.message and 'FROM patients' in r.message
+               for r in caplog.records)
+
+def test_metrics_quantiles_from_buckets():
+    from metrics import RouteStats, BUCKETS
+    stats = RouteStats()
+    stats.buckets[BUCKETS.index(0.01)] = 50
+    stats.buckets[BUCKETS.index(0.1)] = 50
+    stats.count = 100
+    assert stats.quantile(0.5) == pytest.approx(0.01)
+    assert 0.05 < stats.quantile(0.99) <= 0.1
+
+def test_list_patients_filters(client):
+    headers = auth(client)
+    client.post('/departments', headers=headers, json={"name": "Oncology"})
+    for i, admitted_on in enumerate(['2024-03-01', '2024-03-15', '2024-04-02']):
+        client.post('/patients', headers=headers, json={
+            "name": f"onc {i}", "age": 40 + i * 10, "disease": "lymphoma", "admitted_on": admitted_on,
+            "department_id": 2})
+    response = client.get('/patients?department_id=2&admitted_from=2024-03-01&admitted_to=2024-03-31',
+                          headers=headers)
+    assert [p["name"] for p in response.get_json()] == ['onc 0', 'onc 1']
+    response = client.get('/patients?department_id=2&min_age=45&max_age=60', headers=headers)
+    assert [p["name"] for p in response.get_json()] == ['onc 1', 'onc 2']
+    response = client.get('/patients?admitted_from=2024-04-01&limit=1', headers=headers)
+    assert [p["name"] for p in response.get_json()] == ['onc 2']
+    assert client.get('/patients?admitted_from=01/03/2024', headers=headers).status_code == 400
+
+@pytest.mark.parametrize('query, index', [
+    ('department_id=1&admitted_from=2024-01-01&admitted_to=2024-01-31', 'ix_patients_department_admitted'),
+    ('admitted_from=2024-01-01&admitted_to=2024-01-02&limit=10', 'ix_patients_admitted_on'),
+])
+def test_list_patients_filter_uses_index(client, query, index):
+    headers = auth(client)
+    with count_queries(with_parameters=True) as statements:
+        client.get(f'/patients?{query}', headers=headers)
+    statement, parameters = next((s, p) for s, p in statements if 'FROM patients' in s)
+    with app.app_context():
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', tuple(parameters)).all()
+    details = ' | '.join(row[-1] for row in plan)
+    assert f'USING INDEX {index}' in details
@@ -0,0 +1,118 @@
+# Throughput and latency of every public ProductCatalogDB method on a seeded
+# catalog. Runs on the SQLite backend by default, so it needs no MySQL
+# server; pass --mysql to use the database in config.py instead (it must be
+# empty).
+#
+#   python benchmark.py --categories 200 --products 200000 --ops 500
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import config
+from product import ProductCatalogDB
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+def seed(db, categories, products, rng):
+    with db.pool.cursor() as (conn, cursor):
+        cursor.executemany("INSERT INTO categories (category_name) VALUES (%s)",
+                           [(f"category{i}",) for i in range(1, categories + 1)])
+        for start in range(0, products, 10000):
+            cursor.executemany(
+                "INSERT INTO products (name, category_id, price, stock_quantity) VALUES (%s, %s, %s, %s)",
+                [(f"product{i}", rng.randint(1, categories), rng.randint(100, 500000) / 100, rng.randint(0, 500))
+                 for i in range(start, min(start + 10000, products))])
+        conn.commit()
+
+def measure(name, calls, results):
+    # calls: zero-argument callables, each one operation
+    latencies = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+    results.append((name, len(latencies), time.perf_counter() - started, latencies))
+
+def run(db, args):
+    rng = random.Random(args.seed)
+    ops = args.ops
+    product_ids = lambda count: rng.sample(range(1, args.products + 1), min(count, args.products))
+    results = []
+
+    measure("add_category", [lambda i=i: db.add_category(f"new{i}") for i in range(ops)], results)
+    measure("add_product", [lambda i=i: db.add_product(f"new{i}", rng.randint(1, args.categories), 99.5, 5)
+                            for i in range(ops)], results)
+    measure("add_categories (100)", [lambda i=i: db.add_categories([f"bulk{i}-{j}" for j in range(100)])
+                                     for i in range(max(ops // 100, 1))], results)
+    # A supplier feed: half the SKUs already exist (updated), half are new
+    feed = [{"name": f"product{i}", "category_id": rng.randint(1, args.categories),
+             "price": rng.randint(100, 500000) / 100, "stock_quantity": rng.randint(0, 500)}
+            for i in range(args.products // 2, args.products // 2 + args.feed)]
+    measure(f"load_products ({args.feed} rows)", [lambda: db.load_products(feed)], results)
+    measure("add_product (bad category)", [lambda: db.add_product("x", 10 ** 9, 1, 1)] * ops, results)
+    measure("update_product", [lambda i=i: db.update_product(i, rng.randint(100, 500000) / 100, rng.randint(0, 500))
+                               for i in product_ids(ops)], results)
+    measure("reserve_stock (3 lines)", [lambda: db.reserve_stock({i: 1 for i in product_ids(3)})] * ops, results)
+    measure("release_stock", [lambda: db.release_stock({rng.randint(1, args.products): 1})] * ops, results)
+    measure("decrement_stock", [lambda: db.decrement_stock({rng.randint(1, args.products): 1})] * ops, results)
+    measure("delete_product", [lambda i=i: db.delete_product(i) for i in product_ids(ops)], results)
+    measure("search_products", [lambda: db.search_products(rng.randint(100, 10000) / 100)] * args.scans, results)
+    measure("find_products (category+price)",
+            [lambda: db.find_products(category_id=rng.randint(1, args.categories), max_price=rng.randint(100, 5000),
+                                      sort="price")] * ops, results)
+    measure("find_products (name prefix)",
+            [lambda: db.find_products(name_prefix=f"product{rng.randint(1, 999)}", in_stock=True, sort="name")] * ops,
+            results)
+    measure("low_stock_report", [lambda: db.low_stock_report(rng.randint(1, 10))] * args.scans, results)
+    measure("low_stock_items", [db.low_stock_items] * ops, results)
+    measure("show_products", [db.show_products] * args.scans, results)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="ProductCatalogDB benchmark")
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--ops", type=int, default=500, help="operations per point-lookup/write method")
+    parser.add_argument("--feed", type=int, default=200000, help="rows in the load_products feed")
+    parser.add_argument("--scans", type=int, default=5, help="runs of the table-scanning methods")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sqlite", help="SQLite file to use (defaults to a temporary file)")
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL database from config.py")
+    parser.add_argument("--no-cache", action="store_true", help="disable the query result cache")
+    args = parser.parse_args()
+
+    if args.mysql:
+        connect = config.get_connection
+    else:
+        connect = config.sqlite_backend(args.sqlite or os.path.join(tempfile.mkdtemp(), "store.db"),
+                                        config.DB_SQLITE_SCHEMA)
+    db = ProductCatalogDB(config.ConnectionPool(connect=connect, size=args.pool_size), cache=not args.no_cache)
+
+    print(f"Seeding {args.categories} categories, {args.products} products ...")
+    started = time.perf_counter()
+    seed(db, args.categories, args.products, random.Random(args.seed))
+    print(f"Seeded in {time.perf_counter() - started:.1f} s")
+
+    results = run(db, args)
+    print(f"{'operation':<30}{'ops':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, count, elapsed, latencies in results:
+        print(f"{name:<30}{count:>6}{count / elapsed:>10.1f}{percentile(latencies, 50) * 1000:>10.2f}"
+              f"{percentile(latencies, 95) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}")
+    print(db.pool.stats())
+    if db.cache is not None:
+        print(db.cache.stats())
+    db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
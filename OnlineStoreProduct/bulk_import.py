@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson"
+}
+
+
+def read_records(source, fmt=None):
+    # Yields (row number, record) from a path, an open file or an iterable
+    # of dicts. A row that can't be decoded is yielded as a ValueError
+    # instead of a record so the caller can report it and carry on.
+    if isinstance(source, (str, os.PathLike)):
+        fmt = fmt or FORMATS.get(os.path.splitext(str(source))[1].lower())
+        if fmt is None:
+            raise ValueError("Unknown file type, pass fmt='csv' or fmt='ndjson'")
+        with open(source, "rb") as f:
+            yield from read_records(f, fmt)
+        return
+    if not hasattr(source, "read"):
+        yield from enumerate(source, start=1)
+        return
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError("fmt must be 'csv' or 'ndjson' for a file object")
+    if isinstance(source, io.TextIOBase):
+        yield from read_text(source, fmt)
+        return
+    text = io.TextIOWrapper(source, encoding="utf-8", newline="" if fmt == "csv" else None)
+    try:
+        yield from read_text(text, fmt)
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+def read_text(text, fmt):
+    if fmt == "csv":
+        yield from enumerate(csv.DictReader(text), start=1)
+        return
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = ValueError("Invalid JSON")
+        if not isinstance(record, (dict, ValueError)):
+            record = ValueError("Each line must be a JSON object")
+        yield row_number, record
+
+def product_values(record):
+    # (name, category_id or None, category name or None, price, stock_quantity)
+    name = record.get("name")
+    category_id = record.get("category_id")
+    category = record.get("category") or record.get("category_name")
+    price = record.get("price")
+    stock_quantity = record.get("stock_quantity", 0)
+
+    if not name or price in (None, ""):
+        raise ValueError("name and price are required")
+    if category_id in (None, "") and not category:
+        raise ValueError("category_id or category is required")
+    try:
+        price = Decimal(str(price))
+        stock_quantity = int(stock_quantity or 0)
+        category_id = int(category_id) if category_id not in (None, "") else None
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("price must be a number, category_id and stock_quantity integers")
+    if not price.is_finite() or price < 0 or stock_quantity < 0:
+        raise ValueError("price and stock_quantity can't be negative")
+    return str(name), category_id, category, price, stock_quantity
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# Products whose stock_quantity is below a threshold, kept up to date by the
+# ProductCatalogDB write paths instead of rescanning products on every poll.
+# The set is loaded from the database on first use and reloaded once it is
+# older than LOW_STOCK_MAX_AGE seconds, which picks up writes made by other
+# processes. Subscribers get a LowStockEvent each time a product crosses the
+# threshold: low=True when it drops below, low=False when it is restocked or
+# deleted (stock_quantity is None when deleted, or when the crossing was only
+# seen by a reload).
+
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+LOW_STOCK_MAX_AGE = float(os.getenv("LOW_STOCK_MAX_AGE", "60"))
+
+LowStockEvent = namedtuple("LowStockEvent", ["product_id", "stock_quantity", "low"])
+
+
+class LowStockTracker:
+    def __init__(self, threshold=LOW_STOCK_THRESHOLD, max_age=LOW_STOCK_MAX_AGE, clock=time.monotonic):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        # product_id -> stock_quantity, only for products below the threshold
+        self.stock = {}
+        self.loaded_at = None
+        self.subscribers = []
+
+    def stale(self):
+        with self.lock:
+            return self.loaded_at is None or self.clock() - self.loaded_at > self.max_age
+
+    def expire(self):
+        # Forces a reload on next use (after a write whose outcome is unknown)
+        with self.lock:
+            self.loaded_at = None
+
+    def reset(self, rows):
+        # Replaces the set with (product_id, stock_quantity) rows read from the
+        # database; returns the crossings since the previous load
+        with self.lock:
+            current = dict(rows)
+            events = []
+            if self.loaded_at is not None:
+                events = [LowStockEvent(product_id, None, False)
+                          for product_id in self.stock if product_id not in current]
+                events += [LowStockEvent(product_id, stock, True)
+                           for product_id, stock in current.items() if product_id not in self.stock]
+            self.stock = current
+            self.loaded_at = self.clock()
+            return events
+
+    def update(self, changes):
+        # Applies (product_id, stock_quantity or None if deleted) changes;
+        # returns the crossings. Does nothing until the set has been loaded.
+        events = []
+        with self.lock:
+            if self.loaded_at is None:
+                return events
+            for product_id, stock in changes:
+                was_low = product_id in self.stock
+                low = stock is not None and stock < self.threshold
+                if low:
+                    self.stock[product_id] = stock
+                elif was_low:
+                    del self.stock[product_id]
+                if low != was_low:
+                    events.append(LowStockEvent(product_id, stock, low))
+        return events
+
+    def items(self):
+        # {product_id: stock_quantity} for the products currently below the threshold
+        with self.lock:
+            return dict(self.stock)
+
+    def subscribe(self, callback):
+        # callback(event) runs on the writing thread after its commit, so it
+        # should be quick; use subscribe_queue() to hand events to another thread
+        with self.lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def subscribe_queue(self):
+        events = queue.Queue()
+        self.subscribe(events.put)
+        return events
+
+    def unsubscribe(self, subscriber):
+        # Takes a callback, or a queue from subscribe_queue()
+        subscriber = getattr(subscriber, "put", subscriber)
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, events):
+        if not events:
+            return
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print("Low-stock subscriber failed:", e)
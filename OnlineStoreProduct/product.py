@@ -1,101 +1,442 @@
-from config import get_connection
-from mysql.connector import Error
+from bulk_import import product_values, read_records
+from config import pool as shared_pool
+from low_stock import LOW_STOCK_THRESHOLD, LowStockTracker
+from mysql.connector import Error, IntegrityError, errorcode
+from query_cache import QueryCache
+
+# Rows per multi-row statement in add_categories / load_products; each
+# load_products batch is committed on its own
+BATCH_SIZE = 1000
+# Rejected rows listed in a load_products report (all are counted)
+MAX_REJECTED = 1000
+# Rows per page from find_products (and per query in search_products)
+PAGE_SIZE = 100
+# Column positions in a SELECT * products row
+PRODUCT_COLUMNS = {"product_id": 0, "name": 1, "category_id": 2, "price": 3, "stock_quantity": 4}
+# find_products sort orders: (columns, direction). Each ends in a unique
+# column so a page can resume after the last row it returned (keyset paging).
+SORT_ORDERS = {
+    "product_id": (("product_id",), "ASC"),
+    "price": (("price", "product_id"), "ASC"),
+    "-price": (("price", "product_id"), "DESC"),
+    "name": (("name",), "ASC"),
+    "-name": (("name",), "DESC"),
+}
+# Attempts at a stock transaction that MySQL aborts as a deadlock or lock wait timeout
+STOCK_RETRIES = 3
+
+# Conditional stock updates: each only applies if there is enough stock
+# (or reservation) left, checked and changed in one statement, so
+# concurrent orders can't both take the last unit
+STOCK_UPDATES = {
+    "reserve": ("UPDATE products SET reserved_quantity = reserved_quantity + %s "
+                "WHERE product_id = %s AND stock_quantity - reserved_quantity >= %s"),
+    "release": ("UPDATE products SET reserved_quantity = reserved_quantity - %s "
+                "WHERE product_id = %s AND reserved_quantity >= %s"),
+    "decrement": ("UPDATE products SET stock_quantity = stock_quantity - %s "
+                  "WHERE product_id = %s AND stock_quantity - reserved_quantity >= %s"),
+    "fulfil": ("UPDATE products SET stock_quantity = stock_quantity - %s, reserved_quantity = reserved_quantity - %s "
+               "WHERE product_id = %s AND reserved_quantity >= %s AND stock_quantity >= %s"),
+}
+# Tags invalidated by each stock action: reservations only show up in the
+# SELECT * reports, not in show_products
+STOCK_TAGS = {
+    "reserve": ("reserved",),
+    "release": ("reserved",),
+    "decrement": ("products",),
+    "fulfil": ("products", "reserved"),
+}
+
+
+def placeholders(count):
+    return ", ".join(["%s"] * count)
+
+def search_conditions(name_prefix=None, category_id=None, min_price=None, max_price=None, in_stock=False):
+    # (" AND ..." filters, params) for a products search. Each filter is an
+    # index range: uq_products_name for the prefix, ix_products_category_price
+    # for category and price, ix_products_stock for in-stock.
+    conditions = ""
+    params = []
+    if name_prefix:
+        escaped = name_prefix.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        conditions += " AND name LIKE %s ESCAPE '!'"
+        params.append(escaped + "%")
+    if category_id is not None:
+        conditions += " AND category_id = %s"
+        params.append(category_id)
+    if min_price is not None:
+        conditions += " AND price >= %s"
+        params.append(min_price)
+    if max_price is not None:
+        conditions += " AND price <= %s"
+        params.append(max_price)
+    if in_stock:
+        conditions += " AND stock_quantity > 0 AND stock_quantity > reserved_quantity"
+    return conditions, params
+
+def keyset_condition(columns, direction, after):
+    # (" AND ...", params) selecting rows that sort after the key `after`:
+    # (a > x OR (a = x AND b > y)) for columns (a, b)
+    op = ">" if direction == "ASC" else "<"
+    alternatives = []
+    params = []
+    for i, column in enumerate(columns):
+        alternatives.append(" AND ".join([f"{c} = %s" for c in columns[:i]] + [f"{column} {op} %s"]))
+        params.extend(after[:i + 1])
+    return " AND (" + " OR ".join(f"({a})" for a in alternatives) + ")", params
+
+def insert_categories(cursor, names):
+    # Adds the names not already in categories; returns ({name: category_id}, rows added)
+    ids = {}
+    added = 0
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        cursor.execute("INSERT IGNORE INTO categories (category_name) VALUES " + ", ".join(["(%s)"] * len(batch)),
+                       tuple(batch))
+        added += max(cursor.rowcount, 0)
+        cursor.execute(f"SELECT category_name, category_id FROM categories WHERE category_name IN ({placeholders(len(batch))})",
+                       tuple(batch))
+        ids.update(cursor.fetchall())
+    return ids, added
 
 
 class ProductCatalogDB:
+    # search_products, low_stock_report and show_products are answered from
+    # a QueryCache. Cached results are tagged with what they read:
+    # "products" (product rows, prices, stock), "reserved" (reserved_quantity)
+    # and "categories"; each write invalidates the tags it changes. Pass
+    # cache=False to always query the database, or a QueryCache to share one.
+    #
+    # low_stock tracks the products under low_stock_threshold (see
+    # low_stock.py); low_stock_report answers from it for thresholds up to
+    # that one. low_stock_threshold=None turns the tracker off.
+    def __init__(self, pool=None, cache=True, low_stock_threshold=LOW_STOCK_THRESHOLD):
+        self.pool = pool if pool is not None else shared_pool
+        self.cache = QueryCache() if cache is True else cache or None
+        self.low_stock = LowStockTracker(low_stock_threshold) if low_stock_threshold is not None else None
+
     def add_category(self, category_name):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("insert into categories (category_name) values (%s)", (category_name,))
-            conn.commit()
-            print(f"Category '{category_name} added")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor() as (conn, cursor):
+                cursor.execute("INSERT INTO categories (category_name) VALUES (%s)", (category_name,))
+                conn.commit()
+                self._invalidate("categories")
+                print(f"Category '{category_name} added")
+        except Error as e:
+            print("Error:", e)
+
+    def add_categories(self, category_names):
+        # Bulk add_category: one multi-row INSERT per BATCH_SIZE names, skipping
+        # names that already exist. Returns {name: category_id} for every name.
+        names = list(dict.fromkeys(category_names))
+        try:
+            with self.pool.cursor(buffered=True) as (conn, cursor):
+                ids, added = insert_categories(cursor, names)
+                conn.commit()
+                self._invalidate("categories")
+                print(f"{added} categories added, {len(names) - added} already existed.")
+                return ids
+        except Error as e:
+            print("Error:", e)
+            return {}
+
+    def load_products(self, source, fmt=None, create_categories=False):
+        # Bulk add/update of products from a CSV or NDJSON file (path or
+        # binary file object) or an iterable of dicts with name, price,
+        # stock_quantity and category_id or a category name. Products are
+        # upserted by name, BATCH_SIZE rows per INSERT ... ON DUPLICATE KEY
+        # UPDATE with a commit per batch. Category ids are checked against
+        # one up-front fetch of categories; with create_categories, unknown
+        # category names are added in bulk. Rows that fail validation are
+        # skipped and reported as (row number, message).
+        report = {"loaded": 0, "rejected": 0, "errors": [], "categories_added": 0}
+
+        def reject(row_number, message):
+            report["rejected"] += 1
+            if len(report["errors"]) < MAX_REJECTED:
+                report["errors"].append((row_number, message))
+
+        try:
+            with self.pool.cursor(buffered=True) as (conn, cursor):
+                cursor.execute("SELECT category_id, category_name FROM categories")
+                category_ids = set()
+                category_names = {}
+                for category_id, category_name in cursor.fetchall():
+                    category_ids.add(category_id)
+                    category_names[category_name] = category_id
+
+                def flush(batch):
+                    missing = list(dict.fromkeys(category for _, category_id, category, _, _ in batch.values()
+                                                 if category_id is None and category not in category_names))
+                    if missing:
+                        added_ids, added = insert_categories(cursor, missing)
+                        category_names.update(added_ids)
+                        category_ids.update(added_ids.values())
+                        report["categories_added"] += added
+                    rows = [(name, category_id if category_id is not None else category_names[category], price, stock)
+                            for name, category_id, category, price, stock in batch.values()]
+                    cursor.execute(
+                        "INSERT INTO products (name, category_id, price, stock_quantity) VALUES " +
+                        ", ".join(["(%s, %s, %s, %s)"] * len(rows)) +
+                        " ON DUPLICATE KEY UPDATE category_id = VALUES(category_id), price = VALUES(price), "
+                        "stock_quantity = VALUES(stock_quantity)",
+                        tuple(value for row in rows for value in row))
+                    conn.commit()
+                    self._invalidate("products")
+                    report["loaded"] += len(rows)
+
+                # Keyed by name: a later row for the same product replaces an
+                # earlier one in the batch, as it would across batches
+                batch = {}
+                for row_number, record in read_records(source, fmt):
+                    if isinstance(record, ValueError):
+                        reject(row_number, str(record))
+                        continue
+                    try:
+                        values = product_values(record)
+                    except ValueError as e:
+                        reject(row_number, str(e))
+                        continue
+                    name, category_id, category, _, _ = values
+                    if category_id is not None and category_id not in category_ids:
+                        reject(row_number, "Invalid category ID.")
+                        continue
+                    if category_id is None and category not in category_names and not create_categories:
+                        reject(row_number, f"Category '{category}' not found.")
+                        continue
+                    batch.pop(name, None)
+                    batch[name] = values
+                    if len(batch) >= BATCH_SIZE:
+                        flush(batch)
+                        batch = {}
+                if batch:
+                    flush(batch)
+            if self._tracking():
+                self.refresh_low_stock()
+            print(f"{report['loaded']} products loaded, {report['rejected']} rejected.")
         except Error as e:
             print("Error:", e)
+            report["error"] = str(e)
+        return report
+
+    def reserve_stock(self, items):
+        # Holds stock for a whole order: items is {product_id: quantity} or
+        # (product_id, quantity) pairs. All lines are reserved in one
+        # transaction or none are. Returns True, or False if any line is short.
+        return self._adjust_stock("reserve", items)
+
+    def release_stock(self, items):
+        # Gives back reservations made by reserve_stock (cancelled order)
+        return self._adjust_stock("release", items)
+
+    def decrement_stock(self, items, reserved=False):
+        # Takes stock out for shipped items. reserved=True consumes an earlier
+        # reservation; otherwise only unreserved stock can be taken.
+        return self._adjust_stock("fulfil" if reserved else "decrement", items)
+
+    def _adjust_stock(self, action, items):
+        quantities = {}
+        for product_id, quantity in (items.items() if isinstance(items, dict) else items):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if any(not isinstance(quantity, int) or quantity <= 0 for quantity in quantities.values()):
+            print("Quantities must be positive integers.")
+            return False
+        # Rows are always locked in product_id order, so two orders touching
+        # the same products can't deadlock on each other
+        lines = sorted(quantities.items())
+        for attempt in range(STOCK_RETRIES):
+            try:
+                with self.pool.cursor(prepared=True) as (conn, cursor):
+                    for product_id, quantity in lines:
+                        if action == "fulfil":
+                            params = (quantity, quantity, product_id, quantity, quantity)
+                        else:
+                            params = (quantity, product_id, quantity)
+                        cursor.execute(STOCK_UPDATES[action], params)
+                        if cursor.rowcount == 0:
+                            conn.rollback()
+                            print(f"Insufficient stock for product {product_id}.")
+                            return False
+                    changes = []
+                    if action in ("decrement", "fulfil") and self._tracking():
+                        ids = [product_id for product_id, _ in lines]
+                        cursor.execute("SELECT product_id, stock_quantity FROM products "
+                                       f"WHERE product_id IN ({placeholders(len(ids))})", tuple(ids))
+                        changes = cursor.fetchall()
+                    self._commit(conn, changes)
+                    self._invalidate(*STOCK_TAGS[action])
+                    print("Stock updated.")
+                    return True
+            except Error as e:
+                if e.errno in (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT) and attempt + 1 < STOCK_RETRIES:
+                    continue
+                print("Error:", e)
+                return False
 
     def add_product(self, name, category_id, price, stock_quantity):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT category_id FROM categories WHERE category_id = %s", (category_id,))
-            if cursor.fetchone() is None:
-                print("Invalid category ID.")
-                return
-            cursor.execute(
-                "INSERT INTO products (name, category_id, price, stock_quantity) VALUES (%s, %s, %s, %s)",
-                (name, category_id, price, stock_quantity)
-            )
-            conn.commit()
-            print(f"Product '{name}' added.")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(buffered=True) as (conn, cursor):
+                cursor.execute("SELECT category_id FROM categories WHERE category_id = %s", (category_id,))
+                if cursor.fetchone() is None:
+                    print("Invalid category ID.")
+                    return
+                cursor.execute(
+                    "INSERT INTO products (name, category_id, price, stock_quantity) VALUES (%s, %s, %s, %s)",
+                    (name, category_id, price, stock_quantity)
+                )
+                self._commit(conn, [(cursor.lastrowid, stock_quantity)] if self._tracking() else [])
+                self._invalidate("products")
+                print(f"Product '{name}' added.")
+        except IntegrityError as e:
+            # uq_products_name: load_products upserts by name
+            print("Product name already exists." if e.errno == errorcode.ER_DUP_ENTRY else f"Error: {e}")
         except Error as e:
             print("Error:", e)
 
     def update_product(self,product_id, price, stock):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE products SET price = %s, stock_quantity = %s WHERE product_id = %s",
-                       (price, stock, product_id))
-            conn.commit()
-            print("Product updated.")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(prepared=True) as (conn, cursor):
+                cursor.execute("UPDATE products SET price = %s, stock_quantity = %s WHERE product_id = %s",
+                           (price, stock, product_id))
+                self._commit(conn, [(product_id, stock)] if self._tracking() and cursor.rowcount else [])
+                self._invalidate("products")
+                print("Product updated.")
         except Error as e:
             print("Error:", e)
 
 
     def delete_product(self,product_id):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
-            conn.commit()
-            print("Product deleted.")
-            cursor.close()
-            conn.close()
+            with self.pool.cursor(prepared=True) as (conn, cursor):
+                cursor.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
+                self._commit(conn, [(product_id, None)] if self._tracking() and cursor.rowcount else [])
+                self._invalidate("products")
+                print("Product deleted.")
         except Error as e:
             print("Error:", e)
 
+    def find_products(self, name_prefix=None, category_id=None, min_price=None, max_price=None,
+                      in_stock=False, sort="product_id", after=None, limit=PAGE_SIZE):
+        # One page of products (SELECT * rows) matching every filter given, in
+        # `sort` order (see SORT_ORDERS). Returns (rows, next): pass `next` as
+        # `after` for the following page; it is None on the last page.
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        conditions, params = search_conditions(name_prefix, category_id, min_price, max_price, in_stock)
+        return self._page("SELECT * FROM products WHERE 1=1" + conditions, params, sort, after, limit)
+
     def search_products(self,max_price):
+        conditions, params = search_conditions(max_price=max_price)
+        query = "SELECT * FROM products WHERE 1=1" + conditions
+        after = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE price <= %s", (max_price,))
-            for row in cursor.fetchall():
-                print(row)
-            cursor.close()
-            conn.close()
+            while True:
+                # Only the first page is cached: a full listing would otherwise
+                # fill the cache with pages nobody asks for again
+                rows, after = self._page(query, params, "product_id", after, PAGE_SIZE, cached=after is None)
+                for row in rows:
+                    print(row)
+                if after is None:
+                    break
         except Error as e:
             print("Error:", e)
 
+    def _page(self, query, params, sort, after, limit, cached=True):
+        columns, direction = SORT_ORDERS[sort]
+        params = list(params)
+        if after is not None:
+            condition, after_params = keyset_condition(columns, direction, tuple(after))
+            query += condition
+            params.extend(after_params)
+        # One row past the page tells whether there is a next one
+        query += " ORDER BY " + ", ".join(f"{column} {direction}" for column in columns) + " LIMIT %s"
+        params.append(limit + 1)
+        rows = self._rows(("products", "reserved"), query, tuple(params), cached)
+        if len(rows) <= limit:
+            return list(rows), None
+        rows = list(rows[:limit])
+        return rows, tuple(rows[-1][PRODUCT_COLUMNS[column]] for column in columns)
+
     def low_stock_report(self,threshold):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE stock_quantity < %s", (threshold,))
-            for row in cursor.fetchall():
+            if self.low_stock is not None and threshold <= self.low_stock.threshold:
+                # Only the tracked products are read, by primary key; the stock
+                # is checked again since another process may have restocked one
+                # since the tracker was loaded
+                ids = sorted(product_id for product_id, stock in self.low_stock_items().items() if stock < threshold)
+                rows = []
+                for start in range(0, len(ids), BATCH_SIZE):
+                    batch = tuple(ids[start:start + BATCH_SIZE])
+                    rows.extend(self._rows(("products", "reserved"),
+                                           f"SELECT * FROM products WHERE product_id IN ({placeholders(len(batch))})"
+                                           " AND stock_quantity < %s",
+                                           batch + (threshold,)))
+            else:
+                rows = self._rows(("products", "reserved"),
+                                  "SELECT * FROM products WHERE stock_quantity < %s", (threshold,))
+            for row in rows:
                 print(row)
-            cursor.close()
-            conn.close()
         except Error as e:
             print("Error:", e)
 
+    def low_stock_items(self):
+        # {product_id: stock_quantity} for products under the tracker's threshold
+        if self.low_stock is None:
+            raise ValueError("low-stock tracking is off (low_stock_threshold=None)")
+        if self.low_stock.stale():
+            self.refresh_low_stock()
+        return self.low_stock.items()
+
+    def refresh_low_stock(self):
+        # Reloads the tracked set (an index range on stock_quantity) and
+        # notifies subscribers of crossings made since the last load
+        with self.pool.cursor() as (conn, cursor):
+            cursor.execute("SELECT product_id, stock_quantity FROM products WHERE stock_quantity < %s",
+                           (self.low_stock.threshold,))
+            rows = cursor.fetchall()
+        self.low_stock.publish(self.low_stock.reset(rows))
+
     def show_products(self):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-            SELECT p.name, c.category_name, p.price, p.stock_quantity FROM products p
-            LEFT JOIN categories c ON p.category_id = c.category_id""")
-            for row in cursor.fetchall():
+            for row in self._rows(("products", "categories"), """
+                SELECT p.name, c.category_name, p.price, p.stock_quantity FROM products p
+                LEFT JOIN categories c ON p.category_id = c.category_id"""):
                 print(row)
-            cursor.close()
-            conn.close()
         except Error as e:
             print("Error:", e)
 
+    def _rows(self, tags, query, params=(), cached=True):
+        # Rows of a read query, from the cache when there is one and `cached`
+        def load():
+            with self.pool.cursor() as (conn, cursor):
+                cursor.execute(query, params)
+                return tuple(cursor.fetchall())
+        if self.cache is None or not cached:
+            return load()
+        return self.cache.fetch((query, params), tags, load)
+
+    def _tracking(self):
+        # Whether writes need to report stock changes (the tracker is loaded)
+        return self.low_stock is not None and self.low_stock.loaded_at is not None
+
+    def _commit(self, conn, changes):
+        # Commits, applying (product_id, new stock_quantity) changes to the
+        # low-stock tracker first: the transaction still holds the rows' locks,
+        # so concurrent writers reach the tracker in the order they commit.
+        # Subscribers hear about it only once the commit has succeeded.
+        if self.low_stock is None or not changes:
+            conn.commit()
+            return
+        events = self.low_stock.update(changes)
+        try:
+            conn.commit()
+        except Error:
+            self.low_stock.expire()
+            raise
+        self.low_stock.publish(events)
 
+    def _invalidate(self, *tags):
+        if self.cache is not None:
+            self.cache.invalidate(*tags)
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Result cache for the catalog read queries. Entries are keyed by query and
+# parameters, expire after QUERY_CACHE_TTL seconds and are evicted least
+# recently used past QUERY_CACHE_SIZE. Each entry carries the tags of the data
+# it was read from (see product.py); a write invalidates just the entries
+# holding one of the tags it touched. The TTL bounds how stale a result can
+# get from writes made by other processes, which this cache never sees.
+
+QUERY_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "256"))
+QUERY_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "30"))
+
+
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (expires, tags, value), least recently used first
+        self.entries = OrderedDict()
+        self.tagged = {}
+        # Bumped by every invalidation of a tag; a load that saw a tag change
+        # while it ran doesn't store its (possibly stale) result
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def fetch(self, key, tags, load):
+        # The cached value for key, or load()'s result, cached under tags
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._remove(key)
+                self.expired += 1
+            self.misses += 1
+            seen = [self.generations.get(tag, 0) for tag in tags]
+        value = load()
+        with self.lock:
+            if seen != [self.generations.get(tag, 0) for tag in tags]:
+                return value
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (self.clock() + self.ttl, tags, value)
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, *tags):
+        with self.lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+                for key in list(self.tagged.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            for tag in self.tagged:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+            self.entries.clear()
+            self.tagged.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, tags, _ = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
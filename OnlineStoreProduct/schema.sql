@@ -0,0 +1,30 @@
+CREATE DATABASE IF NOT EXISTS storedb;
+USE storedb;
+
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL,
+    UNIQUE KEY uq_categories_name (category_name)
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    category_id INT,
+    price DECIMAL(10, 2) NOT NULL,
+    stock_quantity INT NOT NULL DEFAULT 0,
+    -- Units held by reserve_stock for orders not yet shipped
+    reserved_quantity INT NOT NULL DEFAULT 0,
+    -- load_products upserts by name
+    UNIQUE KEY uq_products_name (name),
+    -- find_products: category and price ranges, in-stock filter and low_stock_report
+    KEY ix_products_category_price (category_id, price),
+    KEY ix_products_stock (stock_quantity),
+    CONSTRAINT fk_products_category FOREIGN KEY (category_id) REFERENCES categories (category_id)
+);
+
+-- For existing tables (remove duplicate names first):
+-- ALTER TABLE categories ADD UNIQUE KEY uq_categories_name (category_name);
+-- ALTER TABLE products ADD UNIQUE KEY uq_products_name (name);
+-- ALTER TABLE products ADD COLUMN reserved_quantity INT NOT NULL DEFAULT 0;
+-- ALTER TABLE products ADD KEY ix_products_category_price (category_id, price), ADD KEY ix_products_stock (stock_quantity);
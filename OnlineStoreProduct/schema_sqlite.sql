@@ -0,0 +1,20 @@
+-- SQLite version of schema.sql, used by config.sqlite_backend() for local
+-- runs, tests and benchmarks without a MySQL server.
+
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    category_id INTEGER REFERENCES categories (category_id),
+    price DECIMAL(10, 2) NOT NULL,
+    stock_quantity INTEGER NOT NULL DEFAULT 0,
+    reserved_quantity INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_categories_name ON categories (category_name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_products_name ON products (name);
+CREATE INDEX IF NOT EXISTS ix_products_category_price ON products (category_id, price);
+CREATE INDEX IF NOT EXISTS ix_products_stock ON products (stock_quantity);
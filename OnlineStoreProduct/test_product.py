@@ -1,5 +1,15 @@
+import contextlib
 import inspect
+import io
+import os
+import pytest
+import threading
+import config
+from low_stock import LowStockEvent, LowStockTracker
+import product
+from fakes import fake_pool
 from product import ProductCatalogDB
+from query_cache import QueryCache
 
 def test_add_category_query():
     db = ProductCatalogDB()
@@ -69,4 +79,347 @@ def test_low_stock_signature():
 
 def test_show_products_signature():
     sig = inspect.signature(ProductCatalogDB.show_products)
-    assert list(sig.parameters.keys()) == ["self"]
\ No newline at end of file
+    assert list(sig.parameters.keys()) == ["self"]
+
+
+def test_add_product_invalid_category_returns_connection():
+    pool, connections = fake_pool(size=1, timeout=0.05)
+    db = ProductCatalogDB(pool)
+    db.add_product("Shirt", 99, 600, 10)
+    db.add_product("Shirt", 99, 600, 10)
+    assert len(connections) == 1
+    assert connections[0].cursors[0].closed
+    assert pool.stats()["idle"] == 1
+    assert connections[0].executed[-1][0] == "SELECT category_id FROM categories WHERE category_id = %s"
+
+def test_add_product_commits_through_pool():
+    pool, connections = fake_pool(size=1)
+    db = ProductCatalogDB(pool)
+    db.add_category("fashion")
+    connections[0].rows = [(1,)]
+    db.add_product("Shirt", 1, 600, 10)
+    db.update_product(1, 500, 11)
+    assert connections[0].executed[-2][0].startswith("INSERT INTO products")
+    assert not connections[0].in_transaction
+    assert pool.stats()["created"] == 1
+
+
+@pytest.fixture
+def sqlite_db():
+    schema = os.path.join(os.path.dirname(__file__), "schema_sqlite.sql")
+    pool = config.ConnectionPool(connect=config.sqlite_backend(":memory:", schema), size=2)
+    yield ProductCatalogDB(pool)
+    pool.close_all()
+
+def test_sqlite_catalog_flow(sqlite_db, capsys):
+    db = sqlite_db
+    db.add_category("fashion")
+    db.add_product("Shirt", 1, 600, 10)
+    db.add_product("Jeans", 1, 1200, 2)
+    db.add_product("Hat", 7, 100, 1)
+    db.update_product(1, 500, 11)
+    db.delete_product(2)
+    capsys.readouterr()
+    db.search_products(1000)
+    assert capsys.readouterr().out == "(1, 'Shirt', 1, Decimal('500'), 11, 0)\n"
+    db.low_stock_report(20)
+    assert "Shirt" in capsys.readouterr().out
+    db.show_products()
+    assert capsys.readouterr().out == "('Shirt', 'fashion', Decimal('500'), 11)\n"
+    assert db.pool.stats()["created"] <= 2
+
+def test_sqlite_invalid_category_reported(sqlite_db, capsys):
+    sqlite_db.add_product("Hat", 7, 100, 1)
+    assert capsys.readouterr().out == "Invalid category ID.\n"
+    assert sqlite_db.pool.stats()["idle"] == 1
+
+def test_sqlite_duplicate_product_name_reported(sqlite_db, capsys):
+    sqlite_db.add_category("fashion")
+    sqlite_db.add_product("Hat", 1, 100, 1)
+    capsys.readouterr()
+    sqlite_db.add_product("Hat", 1, 200, 5)
+    assert capsys.readouterr().out == "Product name already exists.\n"
+    assert sqlite_db.pool.stats()["idle"] == 1
+    sqlite_db.search_products(1000)
+    assert capsys.readouterr().out == "(1, 'Hat', 1, Decimal('100'), 1, 0)\n"
+
+def test_load_products_csv_upserts_and_rejects(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(product, "BATCH_SIZE", 2)
+    db = sqlite_db
+    db.add_category("fashion")
+    db.add_product("Shirt", 1, 600, 10)
+    feed = tmp_path / "feed.csv"
+    feed.write_text("name,category_id,price,stock_quantity\n"
+                    "Shirt,1,550,12\n"
+                    "Jeans,1,1200,2\n"
+                    "Hat,9,100,1\n"
+                    "Socks,1,abc,1\n"
+                    "Belt,1,300,4\n"
+                    "Jeans,1,1100,3\n")
+    report = db.load_products(str(feed))
+    assert report == {"loaded": 4, "rejected": 2, "categories_added": 0,
+                      "errors": [(3, "Invalid category ID."),
+                                 (4, "price must be a number, category_id and stock_quantity integers")]}
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("SELECT name, price, stock_quantity FROM products ORDER BY product_id")
+        assert [(name, float(price), stock) for name, price, stock in cursor.fetchall()] == \
+            [("Shirt", 550, 12), ("Jeans", 1100, 3), ("Belt", 300, 4)]
+
+def test_load_products_ndjson_creates_categories(sqlite_db):
+    db = sqlite_db
+    feed = io.BytesIO(b'{"name": "Kettle", "category": "kitchen", "price": 25.5, "stock_quantity": 3}\n'
+                      b'not json\n'
+                      b'{"name": "Mug", "category": "kitchen", "price": "4.25"}\n'
+                      b'{"name": "Lamp", "category": "lighting", "price": 30}\n')
+    # Without create_categories the unknown categories are rejected
+    assert db.load_products(feed, fmt="ndjson")["errors"][-1] == (4, "Category 'lighting' not found.")
+    feed.seek(0)
+    report = db.load_products(feed, fmt="ndjson", create_categories=True)
+    assert (report["loaded"], report["categories_added"]) == (3, 2)
+    assert report["errors"] == [(2, "Invalid JSON")]
+    ids = db.add_categories(["kitchen", "garden"])
+    assert ids["kitchen"] == 1 and ids["garden"] > 2
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("SELECT p.name, c.category_name FROM products p JOIN categories c ON c.category_id = p.category_id "
+                       "ORDER BY p.name")
+        assert cursor.fetchall() == [("Kettle", "kitchen"), ("Lamp", "lighting"), ("Mug", "kitchen")]
+
+def test_load_products_iterable_single_statement_per_batch():
+    pool, connections = fake_pool(size=1)
+    db = ProductCatalogDB(pool)
+    db.pool.release(db.pool.acquire())
+    connections[0].rows = [(1, "fashion")]
+    records = [{"name": f"p{i}", "category_id": 1, "price": 10, "stock_quantity": i} for i in range(5)]
+    assert db.load_products(records)["loaded"] == 5
+    upserts = [operation for operation, _, _ in connections[0].executed if operation.startswith("INSERT INTO products")]
+    assert len(upserts) == 1
+    assert upserts[0].count("(%s, %s, %s, %s)") == 5
+    assert "ON DUPLICATE KEY UPDATE" in upserts[0]
+
+def stock_of(db, product_id):
+    with db.pool.cursor() as (conn, cursor):
+        cursor.execute("SELECT stock_quantity, reserved_quantity FROM products WHERE product_id = %s", (product_id,))
+        return tuple(cursor.fetchone())
+
+def test_reserve_release_decrement(sqlite_db, capsys):
+    db = sqlite_db
+    db.add_category("fashion")
+    db.add_product("Shirt", 1, 600, 10)
+    db.add_product("Jeans", 1, 1200, 2)
+    assert db.reserve_stock({1: 4, 2: 2})
+    assert (stock_of(db, 1), stock_of(db, 2)) == ((10, 4), (2, 2))
+    capsys.readouterr()
+    # Jeans are all reserved, so the whole order fails and Shirt is untouched
+    assert not db.reserve_stock([(1, 1), (2, 1)])
+    assert capsys.readouterr().out == "Insufficient stock for product 2.\n"
+    assert stock_of(db, 1) == (10, 4)
+    assert not db.decrement_stock({1: 7})
+    assert db.decrement_stock({1: 6})
+    assert db.decrement_stock([(1, 1), (1, 2), (2, 2)], reserved=True)
+    assert (stock_of(db, 1), stock_of(db, 2)) == ((1, 1), (0, 0))
+    assert db.release_stock({1: 1})
+    assert not db.release_stock({1: 1})
+    assert stock_of(db, 1) == (1, 0)
+    assert not db.reserve_stock({1: 0})
+    assert db.pool.stats()["idle"] == db.pool.stats()["open"]
+
+def test_concurrent_reservations_never_oversell(tmp_path):
+    connect = config.sqlite_backend(str(tmp_path / "store.db"), config.DB_SQLITE_SCHEMA)
+    db = product.ProductCatalogDB(config.ConnectionPool(connect=connect, size=4))
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.add_category("fashion")
+        db.add_product("Shirt", 1, 600, 50)
+        db.add_product("Jeans", 1, 1200, 30)
+        results = []
+        lock = threading.Lock()
+
+        def shopper(n):
+            # Orders list the products in both orders; locking is by product_id
+            items = [(1, 1), (2, 1)] if n % 2 else [(2, 1), (1, 1)]
+            for _ in range(10):
+                reserved = db.reserve_stock(items)
+                shipped = reserved and db.decrement_stock(items, reserved=True)
+                with lock:
+                    results.append((reserved, shipped))
+
+        threads = [threading.Thread(target=shopper, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    orders = sum(1 for reserved, shipped in results if shipped)
+    assert all(shipped for reserved, shipped in results if reserved)
+    assert orders == 30
+    assert (stock_of(db, 1), stock_of(db, 2)) == ((20, 0), (0, 0))
+    db.pool.close_all()
+
+def test_query_cache_hits_and_precise_invalidation(sqlite_db, capsys):
+    db = sqlite_db
+    db.add_category("fashion")
+    db.add_product("Shirt", 1, 600, 10)
+    capsys.readouterr()
+    for _ in range(3):
+        db.show_products()
+        db.search_products(1000)
+    assert capsys.readouterr().out == ("('Shirt', 'fashion', Decimal('600'), 10)\n"
+                                       "(1, 'Shirt', 1, Decimal('600'), 10, 0)\n") * 3
+    assert db.cache.stats()["hits"] == 4
+    # Reservations only change what search_products shows
+    db.reserve_stock({1: 2})
+    assert db.cache.stats()["entries"] == 1
+    capsys.readouterr()
+    db.search_products(1000)
+    assert capsys.readouterr().out == "(1, 'Shirt', 1, Decimal('600'), 10, 2)\n"
+    db.update_product(1, 500, 11)
+    assert db.cache.stats()["entries"] == 0
+    capsys.readouterr()
+    db.show_products()
+    assert capsys.readouterr().out == "('Shirt', 'fashion', Decimal('500'), 11)\n"
+    db.add_category("shoes")
+    db.low_stock_report(20)
+    db.delete_product(1)
+    capsys.readouterr()
+    db.low_stock_report(20)
+    db.show_products()
+    assert capsys.readouterr().out == ""
+    stats = db.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (4, 7, round(4 / 11, 4))
+
+def test_query_cache_ttl_lru_and_stale_loads():
+    now = [0.0]
+    cache = QueryCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    loads = []
+    def load(value):
+        loads.append(value)
+        return value
+    assert cache.fetch("a", ("t",), lambda: load(1)) == 1
+    assert cache.fetch("b", ("t",), lambda: load(2)) == 2
+    assert cache.fetch("a", ("t",), lambda: load(0)) == 1
+    cache.fetch("c", ("u",), lambda: load(3))
+    assert list(cache.entries) == ["a", "c"]
+    now[0] = 11
+    assert cache.fetch("a", ("t",), lambda: load(4)) == 4
+    # A write that lands while a load runs keeps its result out of the cache
+    cache.fetch("d", ("u",), lambda: cache.invalidate("u") or load(5))
+    assert "d" not in cache.entries
+    assert loads == [1, 2, 3, 4, 5]
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 5, "hit_rate": round(1 / 6, 4),
+                             "expired": 1, "evictions": 1, "invalidations": 1}
+
+def test_query_cache_disabled():
+    pool, connections = fake_pool(size=1)
+    db = ProductCatalogDB(pool, cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.show_products()
+        db.show_products()
+    assert db.cache is None
+    assert len(connections[0].executed) == 2
+
+def seed_products(db):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.add_categories(["fashion", "shoes"])
+        for i, (name, category_id, price, stock) in enumerate([
+                ("Shirt", 1, 600, 10), ("Shirt_XL", 1, 650, 0), ("Shorts", 1, 400, 3), ("Boots", 2, 2500, 4),
+                ("Sandals", 2, 400, 8), ("Sneakers", 2, 1800, 1), ("Shirt%", 1, 600, 2)]):
+            db.add_product(name, category_id, price, stock)
+
+def all_pages(db, **filters):
+    pages = []
+    after = None
+    while True:
+        rows, after = db.find_products(after=after, **filters)
+        pages.append([row[1] for row in rows])
+        if after is None:
+            return pages
+
+def test_find_products_filters_and_keyset_pages(sqlite_db):
+    db = sqlite_db
+    seed_products(db)
+    assert all_pages(db, sort="price", limit=3) == [["Shorts", "Sandals", "Shirt"],
+                                                     ["Shirt%", "Shirt_XL", "Sneakers"], ["Boots"]]
+    assert all_pages(db, sort="-price", limit=4) == [["Boots", "Sneakers", "Shirt_XL", "Shirt%"],
+                                                      ["Shirt", "Sandals", "Shorts"]]
+    assert all_pages(db, name_prefix="Shirt_", sort="name") == [["Shirt_XL"]]
+    assert all_pages(db, name_prefix="Sh", category_id=1, min_price=500, max_price=600, limit=1) == \
+        [["Shirt"], ["Shirt%"]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.reserve_stock({6: 1})
+    assert all_pages(db, category_id=2, in_stock=True, sort="-name") == [["Sandals", "Boots"]]
+    assert db.find_products(max_price=1, sort="price") == ([], None)
+    with pytest.raises(ValueError):
+        db.find_products(sort="rating")
+
+def test_find_products_uses_indexes(sqlite_db):
+    seed_products(sqlite_db)
+    with sqlite_db.pool.cursor() as (conn, cursor):
+        cursor.execute("EXPLAIN QUERY PLAN SELECT * FROM products WHERE 1=1 AND category_id = ? AND price <= ?",
+                       (1, 600))
+        assert "ix_products_category_price" in str(cursor.fetchall())
+        cursor.execute("EXPLAIN QUERY PLAN SELECT * FROM products WHERE stock_quantity < ?", (5,))
+        assert "ix_products_stock" in str(cursor.fetchall())
+
+def test_search_products_pages_through_matches(sqlite_db, capsys, monkeypatch):
+    monkeypatch.setattr(product, "PAGE_SIZE", 2)
+    seed_products(sqlite_db)
+    sqlite_db.search_products(650)
+    assert [line.split(",")[1] for line in capsys.readouterr().out.splitlines()] == \
+        [" 'Shirt'", " 'Shirt_XL'", " 'Shorts'", " 'Sandals'", " 'Shirt%'"]
+    stats = sqlite_db.cache.stats()
+    assert stats["misses"] == 1 and stats["entries"] == 1
+    sqlite_db.search_products(650)
+    assert len(capsys.readouterr().out.splitlines()) == 5
+    stats = sqlite_db.cache.stats()
+    assert stats["hits"] == 1 and stats["entries"] == 1
+
+def test_low_stock_tracker_follows_writes(sqlite_db, capsys):
+    db = sqlite_db
+    seed_products(db)
+    events = db.low_stock.subscribe_queue()
+    seen = []
+    db.low_stock.subscribe(seen.append)
+    db.low_stock.subscribe(lambda event: 1 / 0)
+    assert db.low_stock_items() == {2: 0, 3: 3, 4: 4, 5: 8, 6: 1, 7: 2}
+    db.update_product(1, 600, 9)
+    db.update_product(5, 400, 30)
+    db.add_product("Sliders", 2, 300, 2)
+    db.reserve_stock({4: 4})
+    db.decrement_stock({4: 4}, reserved=True)
+    db.decrement_stock({1: 1, 3: 1})
+    db.delete_product(6)
+    db.update_product(99, 1, 1)
+    assert seen == [LowStockEvent(1, 9, True), LowStockEvent(5, 30, False), LowStockEvent(8, 2, True),
+                    LowStockEvent(6, None, False)]
+    assert [events.get_nowait() for _ in seen] == seen and events.empty()
+    assert capsys.readouterr().out.count("Low-stock subscriber failed: division by zero") == 4
+    assert db.low_stock_items() == {1: 8, 2: 0, 3: 2, 4: 0, 7: 2, 8: 2}
+    db.low_stock_report(3)
+    assert [line.split(",")[1] for line in capsys.readouterr().out.splitlines()] == \
+        [" 'Shirt_XL'", " 'Shorts'", " 'Boots'", " 'Shirt%'", " 'Sliders'"]
+    # Thresholds above the tracker's are answered by the table query
+    db.low_stock_report(20)
+    assert len(capsys.readouterr().out.splitlines()) == 6
+
+def test_low_stock_tracker_reloads_other_writers(sqlite_db):
+    db = sqlite_db
+    seed_products(db)
+    now = [0.0]
+    db.low_stock = LowStockTracker(threshold=5, max_age=30, clock=lambda: now[0])
+    seen = []
+    db.low_stock.subscribe(seen.append)
+    assert set(db.low_stock_items()) == {2, 3, 4, 6, 7}
+    other = ProductCatalogDB(db.pool, cache=False, low_stock_threshold=None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        other.update_product(1, 600, 1)
+        other.update_product(2, 650, 50)
+        assert set(db.low_stock_items()) == {2, 3, 4, 6, 7}
+        # The tracker hasn't seen the restock yet, the report still has
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            db.low_stock_report(5)
+        assert [line.split(",")[0] for line in report.getvalue().splitlines()] == ["(3", "(4", "(6", "(7"]
+        now[0] = 31
+        assert set(db.low_stock_items()) == {1, 3, 4, 6, 7}
+        db.load_products([{"name": "Boots", "category_id": 2, "price": 2500, "stock_quantity": 40}])
+    assert seen == [LowStockEvent(2, None, False), LowStockEvent(1, 1, True), LowStockEvent(4, None, False)]
+    with pytest.raises(ValueError):
+        other.low_stock_items()
@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from mysql.connector import errors
+
+# Connection pool used by the CLI projects' config.py (EmployeeDB,
+# ProductCatalogDB). At most DB_POOL_SIZE connections are open; a caller that
+# finds them all checked out waits up to DB_POOL_TIMEOUT seconds. A connection
+# idle for longer than DB_POOL_PING_AFTER seconds is pinged before reuse.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))
+# Prepared statements kept per connection by pool.cursor(prepared=True)
+DB_PREPARED_CACHE_SIZE = int(os.getenv("DB_PREPARED_CACHE_SIZE", 32))
+
+
+class PreparedStatements:
+    # Cursor stand-in that keeps one server-side prepared statement per SQL
+    # string on a connection, so repeating a query skips the re-prepare.
+    # Evicted statements are closed (deallocated) once the cache is full.
+
+    def __init__(self, conn, size):
+        self.conn = conn
+        self.size = size
+        self.statements = OrderedDict()
+        self.current = None
+        self.hits = 0
+        self.misses = 0
+
+    def execute(self, operation, params=()):
+        self.current = self._statement(operation)
+        self.current.execute(operation, params)
+
+    def executemany(self, operation, seq_params):
+        self.current = self._statement(operation)
+        self.current.executemany(operation, seq_params)
+
+    def fetchone(self):
+        return self.current.fetchone()
+
+    def fetchmany(self, size=1):
+        return self.current.fetchmany(size)
+
+    def fetchall(self):
+        return self.current.fetchall()
+
+    @property
+    def rowcount(self):
+        return self.current.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.current.lastrowid
+
+    def reset(self):
+        # Drop any unread rows so the connection is clean for the next user
+        if self.current is not None:
+            try:
+                self.current.fetchall()
+            except errors.Error:
+                pass
+            self.current = None
+
+    def close(self):
+        for cursor in self.statements.values():
+            try:
+                cursor.close()
+            except errors.Error:
+                pass
+        self.statements.clear()
+
+    def _statement(self, operation):
+        self.reset()
+        cursor = self.statements.get(operation)
+        if cursor is not None:
+            self.statements.move_to_end(operation)
+            self.hits += 1
+            return cursor
+        self.misses += 1
+        cursor = self.statements[operation] = self.conn.cursor(prepared=True)
+        if len(self.statements) > self.size:
+            _, evicted = self.statements.popitem(last=False)
+            evicted.close()
+        return cursor
+
+
+class ConnectionPool:
+    # A fixed-size pool of database connections shared by the DB classes.
+    # `connect` is the factory for new connections: mysql.connector.connect
+    # with the app's settings, sqlite_backend(), or a test double.
+
+    def __init__(self, connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 ping_after=DB_POOL_PING_AFTER, prepared_cache_size=DB_PREPARED_CACHE_SIZE):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.prepared_cache_size = prepared_cache_size
+        self.cond = threading.Condition()
+        self.idle = []
+        self.prepared = {}
+        self.open = 0
+        self.created = 0
+        self.discarded = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.health_checks = 0
+
+    def acquire(self):
+        while True:
+            conn, idle_since = self._checkout()
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                with self.cond:
+                    self.created += 1
+                return conn
+            if self._healthy(conn, idle_since):
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        try:
+            # Never hand the next caller someone else's open transaction
+            if getattr(conn, 'in_transaction', True):
+                conn.rollback()
+        except errors.Error:
+            self.discard(conn)
+            return
+        with self.cond:
+            self.idle.append((conn, time.monotonic()))
+            self.cond.notify()
+
+    def discard(self, conn):
+        with self.cond:
+            statements = self.prepared.pop(id(conn), None)
+        if statements is not None:
+            statements.close()
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+        with self.cond:
+            self.discarded += 1
+        self._forget()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except (errors.OperationalError, errors.InterfaceError):
+            # The connection itself may be broken; don't return it
+            self.discard(conn)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    @contextmanager
+    def cursor(self, prepared=False, **options):
+        # Yields (conn, cursor); the cursor is closed and the connection
+        # returned to the pool however the block exits
+        with self.connection() as conn:
+            if prepared:
+                cursor = self._prepared(conn)
+                try:
+                    yield conn, cursor
+                finally:
+                    cursor.reset()
+            else:
+                cursor = conn.cursor(**options)
+                try:
+                    yield conn, cursor
+                finally:
+                    try:
+                        cursor.close()
+                    except errors.Error:
+                        pass
+
+    def close_all(self):
+        with self.cond:
+            idle, self.idle = self.idle, []
+        for conn, _ in idle:
+            self.discard(conn)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "size": self.size,
+                "open": self.open,
+                "idle": len(self.idle),
+                "created": self.created,
+                "discarded": self.discarded,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "health_checks": self.health_checks,
+                "prepared_hits": sum(s.hits for s in self.prepared.values()),
+                "prepared_misses": sum(s.misses for s in self.prepared.values())
+            }
+
+    def _checkout(self):
+        # Returns (idle connection, idle since), or (None, None) once a slot
+        # for a new connection has been reserved
+        with self.cond:
+            deadline = None
+            while not self.idle and self.open >= self.size:
+                now = time.monotonic()
+                if deadline is None:
+                    self.waits += 1
+                    started = now
+                    deadline = now + self.timeout
+                if now >= deadline:
+                    self.wait_seconds += now - started
+                    raise errors.PoolError(f"No connection available within {self.timeout} seconds")
+                self.cond.wait(deadline - now)
+            if deadline is not None:
+                self.wait_seconds += time.monotonic() - started
+            if self.idle:
+                return self.idle.pop()
+            self.open += 1
+            return None, None
+
+    def _forget(self):
+        with self.cond:
+            self.open -= 1
+            self.cond.notify()
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        with self.cond:
+            self.health_checks += 1
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except errors.Error:
+            return False
+
+    def _prepared(self, conn):
+        with self.cond:
+            statements = self.prepared.get(id(conn))
+            if statements is None or statements.conn is not conn:
+                statements = self.prepared[id(conn)] = PreparedStatements(conn, self.prepared_cache_size)
+            return statements
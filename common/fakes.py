@@ -0,0 +1,79 @@
+from dbpool import ConnectionPool
+from mysql.connector import errors
+
+# Test doubles for a mysql.connector connection, shared by the projects'
+# tests. conn.rows is what every query returns, or a callable(operation,
+# params) giving the rows for each query; conn.fail, if set, is raised by the
+# next execute.
+
+
+class FakeCursor:
+    def __init__(self, conn, prepared=False):
+        self.conn = conn
+        self.prepared = prepared
+        self.rowcount = 1
+        self.rows = []
+        self.closed = False
+
+    def execute(self, operation, params=()):
+        if self.conn.fail:
+            raise self.conn.fail
+        self.conn.executed.append((operation, params, self.prepared))
+        rows = self.conn.rows
+        self.rows = list(rows(operation, params) if callable(rows) else rows)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        self.conn.fetches += 1
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.rows = []
+        self.cursors = []
+        self.fetches = 0
+        self.fail = None
+        self.in_transaction = False
+        self.pings = 0
+        self.alive = True
+        self.closed = False
+
+    def cursor(self, prepared=False, **options):
+        cursor = FakeCursor(self, prepared)
+        self.cursors.append(cursor)
+        self.in_transaction = True
+        return cursor
+
+    def commit(self):
+        self.in_transaction = False
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise errors.InterfaceError("gone")
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pool(**options):
+    connections = []
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+    return ConnectionPool(connect=connect, **options), connections
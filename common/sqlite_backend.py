@@ -0,0 +1,179 @@
+import itertools
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from mysql.connector import errors
+
+# SQLite stand-in for mysql.connector. The SQL the DB classes write is
+# MySQL; translate() rewrites the handful of MySQL-only pieces they use, NOW()
+# and TIMESTAMPDIFF() are provided as functions, and sqlite3 errors are raised
+# as the matching mysql.connector errors, so callers can't tell the difference.
+
+# Seconds a SQLite writer waits for another connection's lock
+DB_SQLITE_BUSY_TIMEOUT = float(os.getenv("DB_SQLITE_BUSY_TIMEOUT", 30))
+
+SQLITE_ERRNO = (
+    ("UNIQUE constraint failed", 1062),
+    ("FOREIGN KEY constraint failed", 1452),
+    ("NOT NULL constraint failed", 1048),
+    ("CHECK constraint failed", 3819),
+    ("locked", 1205),
+    ("no such table", 1146),
+)
+TIMESTAMPDIFF_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+# Names the private in-memory databases handed out by sqlite_backend()
+sqlite_databases = itertools.count()
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+
+@lru_cache(maxsize=1024)
+def translate(operation):
+    sql = operation.replace("%s", "?")
+    sql = re.sub(r"\s+FOR UPDATE\b", "", sql)
+    sql = re.sub(r"\bINSERT IGNORE\b", "INSERT OR IGNORE", sql)
+    sql = re.sub(r"\bTIMESTAMPDIFF\(\s*(\w+)\s*,", r"TIMESTAMPDIFF('\1',", sql)
+    head, found, tail = sql.partition("ON DUPLICATE KEY UPDATE")
+    if found:
+        sql = head + "ON CONFLICT DO UPDATE SET" + re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", tail)
+    return sql
+
+def sqlite_error(e):
+    message = str(e)
+    errno = next((number for text, number in SQLITE_ERRNO if text in message), None)
+    if isinstance(e, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=message, errno=errno)
+    if errno == 1205:
+        return errors.DatabaseError(msg=message, errno=errno)
+    if isinstance(e, (sqlite3.OperationalError, sqlite3.ProgrammingError)):
+        return errors.ProgrammingError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.InterfaceError):
+        return errors.InterfaceError(msg=message, errno=errno)
+    return errors.DatabaseError(msg=message, errno=errno)
+
+def sqlite_now():
+    return datetime.now().replace(microsecond=0).isoformat(" ")
+
+def sqlite_timestampdiff(unit, start, end):
+    # Whole units like MySQL, but as a float: SQLite's "/" on two integers
+    # would truncate the "TIMESTAMPDIFF(MINUTE, ...) / 60" hours to whole hours
+    if start is None or end is None:
+        return None
+    seconds = (datetime.fromisoformat(str(end)) - datetime.fromisoformat(str(start))).total_seconds()
+    return float(int(seconds / TIMESTAMPDIFF_SECONDS[unit.upper()]))
+
+
+class SQLiteCursor:
+    def __init__(self, conn):
+        self.cursor = conn.raw.cursor()
+
+    def execute(self, operation, params=()):
+        try:
+            self.cursor.execute(translate(operation), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise sqlite_error(e) from e
+
+    def executemany(self, operation, seq_params):
+        try:
+            self.cursor.executemany(translate(operation), [tuple(params) for params in seq_params])
+        except sqlite3.Error as e:
+            raise sqlite_error(e) from e
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self.cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+
+class SQLiteConnection:
+    # The slice of the mysql.connector connection API the DB classes use;
+    # prepared and buffered cursors are plain cursors (sqlite3 caches
+    # compiled statements itself and always fetches lazily)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, prepared=False, buffered=None, **options):
+        return SQLiteCursor(self)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        try:
+            self.raw.execute("SELECT 1")
+        except sqlite3.Error as e:
+            raise errors.InterfaceError(msg=str(e)) from e
+
+    def close(self):
+        self.raw.close()
+
+
+def sqlite_backend(database=":memory:", schema=None):
+    # Returns a connect() for ConnectionPool. ":memory:" is a private shared
+    # in-memory database that lives as long as the returned function; use a
+    # file for concurrent writers (it runs in WAL mode).
+    memory = database == ":memory:"
+    target = f"file:memdb{next(sqlite_databases)}?mode=memory&cache=shared" if memory else database
+    state = {"ready": False, "anchor": None}
+    lock = threading.Lock()
+
+    def open_raw():
+        raw = sqlite3.connect(target, uri=memory, timeout=DB_SQLITE_BUSY_TIMEOUT,
+                              detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        raw.execute("PRAGMA foreign_keys = ON")
+        raw.create_function("NOW", 0, sqlite_now)
+        raw.create_function("TIMESTAMPDIFF", 3, sqlite_timestampdiff, deterministic=True)
+        return raw
+
+    def connect():
+        with lock:
+            if not state["ready"]:
+                raw = open_raw()
+                if memory:
+                    state["anchor"] = raw
+                else:
+                    raw.execute("PRAGMA journal_mode = WAL")
+                if schema is not None:
+                    with open(schema) as f:
+                        raw.executescript(f.read())
+                if not memory:
+                    raw.close()
+                state["ready"] = True
+        try:
+            return SQLiteConnection(open_raw())
+        except sqlite3.Error as e:
+            raise sqlite_error(e) from e
+
+    return connect
@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from mysql.connector import errors
+from fakes import fake_pool
+from sqlite_backend import sqlite_backend, translate
+from dbpool import ConnectionPool
+
+def test_pool_waits_then_times_out():
+    pool, connections = fake_pool(size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(errors.PoolError):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats()["waits"] == 1
+
+def test_pool_hands_over_to_waiting_thread():
+    pool, connections = fake_pool(size=1, timeout=5)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(conn)
+    waiter.join()
+    assert got == [conn]
+    assert pool.stats()["waits"] == 1
+
+def test_pool_replaces_dead_idle_connection():
+    pool, connections = fake_pool(size=1, ping_after=0)
+    with pool.cursor() as (conn, cursor):
+        pass
+    connections[0].alive = False
+    with pool.cursor() as (conn, cursor):
+        assert conn is connections[1]
+    assert connections[0].closed
+    assert pool.stats()["health_checks"] == 1
+    assert pool.stats()["open"] == 1
+
+def test_translate_mysql_to_sqlite():
+    assert translate("SELECT a FROM t WHERE b = %s FOR UPDATE") == "SELECT a FROM t WHERE b = ?"
+    assert translate("INSERT IGNORE INTO t (a) VALUES (%s)") == "INSERT OR IGNORE INTO t (a) VALUES (?)"
+    assert translate("INSERT INTO t (a, n) VALUES (%s, %s) ON DUPLICATE KEY UPDATE n = n + VALUES(n)") == \
+        "INSERT INTO t (a, n) VALUES (?, ?) ON CONFLICT DO UPDATE SET n = n + excluded.n"
+    assert translate("SELECT TIMESTAMPDIFF(MINUTE, a, b) / 60") == "SELECT TIMESTAMPDIFF('MINUTE', a, b) / 60"
+
+def test_sqlite_errors_map_to_mysql_errors(tmp_path):
+    schema = tmp_path / "schema.sql"
+    schema.write_text("CREATE TABLE t (a INTEGER PRIMARY KEY, b INTEGER NOT NULL);")
+    pool = ConnectionPool(connect=sqlite_backend(":memory:", str(schema)), size=1)
+    with pool.cursor() as (conn, cursor):
+        cursor.execute("INSERT INTO t (a, b) VALUES (%s, %s)", (1, 1))
+        conn.commit()
+    for params, errno in (((1, 2), 1062), ((2, None), 1048)):
+        with pytest.raises(errors.IntegrityError) as raised:
+            with pool.cursor() as (conn, cursor):
+                cursor.execute("INSERT INTO t (a, b) VALUES (%s, %s)", params)
+        assert raised.value.errno == errno
+    with pytest.raises(errors.ProgrammingError) as raised:
+        with pool.cursor() as (conn, cursor):
+            cursor.execute("SELECT * FROM missing")
+    assert raised.value.errno == 1146
+    assert pool.stats()["idle"] == 1
+    pool.close_all()
+
+def test_sqlite_upsert_and_timestampdiff():
+    pool = ConnectionPool(connect=sqlite_backend(), size=1)
+    with pool.cursor() as (conn, cursor):
+        cursor.execute("CREATE TABLE n (k INTEGER PRIMARY KEY, v INTEGER)")
+        for _ in range(2):
+            cursor.execute("INSERT INTO n (k, v) VALUES (%s, %s) ON DUPLICATE KEY UPDATE v = v + VALUES(v)", (1, 5))
+        cursor.execute("SELECT v, TIMESTAMPDIFF(MINUTE, '2024-01-01 10:00:00', '2024-01-01 11:30:59') FROM n")
+        assert cursor.fetchone() == (10, 90.0)
+    pool.close_all()